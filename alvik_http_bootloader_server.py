@@ -1,30 +1,83 @@
 import os
+import json
 from alvik_http_server.alvik_http_server import AlvikHTTPServer
-from alvik_logger.logger import logger
-from alvik_utils.upy_code_runner import UPYCodeRunner
+from alvik_http_server.alvik_websocket import AlvikWebSocket, AlvikWebSocketEventWriter
+from alvik_logger.logger import LEVELS, file_handler, get_levels, get_logger, get_sampling, set_level, set_sampling
+from alvik_logger.upy_logging_handler import BufferedRotatingFileHandler
+from alvik_utils.upy_code_runner import UPYCodeRunner, OVERFLOW_DROP, STOP_ABANDONED, STOP_NOT_RUNNING
+from alvik_utils.upy_compile_cache import UPYCompileCache
+from alvik_utils.upy_file_index import UPYFileIndex
+from alvik_utils.upy_job_queue import UPYJob, UPYJobQueue
+from alvik_utils.upy_log_reader import UPYLogReader
+from alvik_utils.upy_multipart import UPYMultipartReader, UPYMultipartPart, get_multipart_boundary
+from alvik_utils.upy_run_stats import UPYRunHistory
+from alvik_utils.upy_streamreader import UPYHTTPRequest
 from alvik_utils.upy_streamwriter import UPYStreamWriter
-try:
-    import ure  # Im ESP32 heißt das Regexmodul ure
-except ImportError:
-    import re as ure
+from alvik_utils.utils import etag_matches
 try:
     from typing import List, Tuple
 except ImportError:
     List = None  # Platzhalter, da MicroPython kein `typing` hat
     Tuple = None
 
+logger = get_logger("http")
+fs_logger = get_logger("fs")
+
 ALVIK_NAME = "ALVIK24-03"
 ALVIK_HOTSPOT_PW = "12345678"
 
 class AlvikHTTPBootloader:
+    _EVENT_STREAM_HEADERS = (("Content-Type", "text/event-stream"), ("Cache-Control", "no-cache"))
 
     def __init__(self):
         self.code_runner: UPYCodeRunner = None
+        self.output_overflow = OVERFLOW_DROP  # OVERFLOW_DROP, OVERFLOW_BLOCK oder OVERFLOW_SPILL
+        self.output_queue_bytes = 4096  # Puffer für Skript-Ausgabe, die der Client noch nicht abgeholt hat
+        self.output_replay_bytes = 4096  # letzte Ausgabe für weitere Zuschauer und Wiederverbindungen
+        self.compile_cache = UPYCompileCache()
+        self.file_index = UPYFileIndex()
+        self.run_history = UPYRunHistory()
+        self.jobs = UPYJobQueue(self._create_runner, stop_timeout=2)  # Sekunden, die ein Skript nach /stop noch zum Beenden hat
+        # Abfragen gehen nur mit dem Klartext-Log, das binäre Ring-Log wird am PC dekodiert
+        self.log_reader = UPYLogReader(file_handler) if isinstance(file_handler, BufferedRotatingFileHandler) else None
         self.controller = AlvikHTTPServer("bootloader_index.html")
-        self.controller.add_endpoint("GET /files", self._endpoint_get_files)
+        self.controller.add_endpoint("GET /files", self._endpoint_get_files)  # GET /files?hash=1
+        self.controller.add_endpoint("DELETE /files/<name>", self._endpoint_delete_file)
         self.controller.add_endpoint("POST /upload", self._endpoint_upload_files)
-        self.controller.add_endpoint("GET /run?file=*.py", self._endpoint_run_py_file)  # GET /run?file=
+        self.controller.add_endpoint("GET /run", self._endpoint_run_py_file)  # GET /run?file=<name>.py
         self.controller.add_endpoint("GET /stop", self._endpoint_stop_py_file)
+        self.controller.add_endpoint("GET /output", self._endpoint_output)  # GET /output?since=<id>
+        self.controller.add_endpoint("GET /runs", self._endpoint_runs)
+        self.controller.add_endpoint("GET /logs", self._endpoint_logs)  # GET /logs?tail=<n>|since=<offset>|after=<time>|follow=1&level=<LEVEL>
+        self.controller.add_endpoint("GET /logs/levels", self._endpoint_log_levels)
+        self.controller.add_endpoint("POST /logs/levels", self._endpoint_set_log_levels)  # POST /logs/levels?http=DEBUG&runner.output=10
+        self.controller.add_endpoint("POST /jobs", self._endpoint_submit_job)  # POST /jobs?file=<name>.py&priority=<n>&time_limit=<s>
+        self.controller.add_endpoint("GET /jobs", self._endpoint_list_jobs)
+        self.controller.add_endpoint("GET /jobs/<id>", self._endpoint_get_job)
+        self.controller.add_endpoint("POST /jobs/<id>/cancel", self._endpoint_cancel_job)
+        self.controller.add_endpoint("GET /jobs/<id>/output", self._endpoint_job_output)  # GET /jobs/<id>/output?since=<id>
+        self.controller.add_websocket_endpoint("/ws", self._websocket_control)
+        self.controller.add_shutdown_handler(self.jobs.shutdown)
+        self._ws_commands = {
+            "files": self._ws_command_files,
+            "run": self._ws_command_run,
+            "stop": self._ws_command_stop,
+            "watch": self._ws_command_watch,
+            "runs": self._ws_command_runs,
+            "submit": self._ws_command_submit,
+            "jobs": self._ws_command_jobs,
+            "cancel": self._ws_command_cancel,
+        }
+
+    def add_ws_command(self, name: str, callback) -> None:
+        """Registriert ein Kommando für den WebSocket `/ws`.
+
+        Der Callback `callback(command: dict, output: AlvikWebSocketEventWriter)` bekommt die
+        empfangene JSON-Nachricht (z. B. `{"cmd": "drive", "speed": 10}`) und gibt ein
+        Dictionary als Antwort oder None zurück.
+        """
+        self._ws_commands[name] = callback
+
     def start_hotspot(self, ssid: str = ALVIK_NAME, password: str = ALVIK_HOTSPOT_PW):
         self.controller.start_hotspot(ssid, password)
 
@@ -34,54 +87,315 @@ class AlvikHTTPBootloader:
     def start(self):
         self.controller.start_web_server()
 
-    async def _endpoint_get_files(self, _: str, __: UPYStreamWriter) -> Tuple[int, str]:
-        files = os.listdir(".")  # Liste aller Dateien im aktuellen Verzeichnis
-        file_list = "\n".join(files)  # Dateien als Textliste zurückgeben
-        logger.debug(f"Current files on server: {files}")
-        return 200, file_list
-
-    async def _endpoint_upload_files(self, request: str, __: UPYStreamWriter) -> Tuple[int, str]:
-            _, header, file_content = request.split("\r\n\r\n", 2)
-
-            # Den Dateinamen aus `Content-Disposition` extrahieren
-            match = ure.search(r'filename="([^"]+)"', header)
-            filename = "unknown_file"  # Falls kein Dateiname gefunden wurde
-            if match:
-                filename = match.group(1)  # Dateiname aus dem Header extrahieren
-
-            # Falls die Datei am Ende noch einen Trennstring hat (Multipart), diesen entfernen
-            file_content = file_content.split("\r\n------", 1)[0]
-
-            # Datei speichern
-            with open(filename, "wb") as file:
-                file.write(file_content.encode())
-
-            logger.info(f"Datei '{filename}' erfolgreich gespeichert")
-            return 200, f"Datei '{filename}' erfolgreich gespeichert."
-
-    async def _run_python_file(self, filename: str, writer: UPYStreamWriter) -> None:
-        """Startet eine Python-Datei und sendet deren Output in Echtzeit zurück."""
-        if self.code_runner is not None:
-            await self.code_runner.stop_and_wait()
-        self.code_runner = UPYCodeRunner(filename, writer)
-        await self.code_runner.run_file()
-
-    async def _endpoint_run_py_file(self, request: str, writer: UPYStreamWriter) -> Tuple[int, str]:
-        filename = request.split("GET /run?file=")[1].split(" ")[0]
-        response = (
-            "HTTP/1.1 200 OK\r\n"
-            "Content-Type: text/event-stream\r\n"
-            "Cache-Control: no-cache\r\n"
-            "Connection: keep-alive\r\n\r\n"
-        )
-        await writer.awrite(response.encode("utf-8"))
+    async def _endpoint_get_files(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+        """Dateien als JSON (`name`, `dir`, `size`, `mtime`, mit `hash=1` auch `sha1`).
+
+        Die Liste kommt aus dem Cache von `file_index`; kennt der Browser sie schon
+        (`If-None-Match`), gibt es nur 304.
+        """
+        body, etag = self.file_index.get(bool(request.query.get("hash")))
+        headers = (("ETag", etag), ("Cache-Control", "no-cache"))
+        if_none_match = request.header("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            await writer.send_headers(304, headers)
+        else:
+            await writer.send_response(200, body, "application/json", headers=headers)
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_delete_file(self, request: UPYHTTPRequest, __: UPYStreamWriter) -> Tuple[int, str]:
+        filename = self._sanitize_filename(request.params["name"])
+        if not filename:
+            return 400, "Kein Dateiname angegeben."
+        try:
+            os.remove(filename)
+        except OSError:
+            return 404, f"Datei '{filename}' nicht gefunden."
+        self.compile_cache.invalidate(filename)
+        self.file_index.invalidate()
+        fs_logger.info("Datei '%s' gelöscht", filename)
+        return 200, f"Datei '{filename}' gelöscht."
+
+    async def _endpoint_upload_files(self, request: UPYHTTPRequest, __: UPYStreamWriter) -> Tuple[int, str]:
+        boundary = get_multipart_boundary(request.header("content-type"))
+        multipart = UPYMultipartReader(request.body, boundary)
+        saved_files = []
+        try:
+            while True:
+                part = await multipart.next_part()
+                if part is None:
+                    break
+                filename = self._sanitize_filename(part.filename)
+                if not filename:
+                    continue  # Formularfelder ohne Datei ignorieren
+                await self._save_part(part, filename)
+                self.compile_cache.invalidate(filename)
+                fs_logger.info("Datei '%s' erfolgreich gespeichert", filename)
+                saved_files.append(filename)
+        finally:
+            self.file_index.invalidate()  # auch wenn ein späterer Teil fehlschlägt, frühere sind gespeichert
+        if not saved_files:
+            return 400, "Keine Datei im Upload gefunden."
+        return 200, "\n".join(f"Datei '{filename}' erfolgreich gespeichert." for filename in saved_files)
+
+    @staticmethod
+    def _sanitize_filename(filename: str) -> str:
+        """Entfernt Verzeichnisanteile aus dem vom Browser gesendeten Dateinamen."""
+        if not filename:
+            return ""
+        return filename.replace("\\", "/").split("/")[-1]
+
+    @staticmethod
+    async def _save_part(part: UPYMultipartPart, filename: str) -> None:
+        """Schreibt einen Multipart-Teil blockweise in eine temporäre Datei und benennt sie danach um."""
+        tmp_filename = filename + ".part"
+        try:
+            with open(tmp_filename, "wb") as fp:
+                while True:
+                    chunk = await part.read_chunk()
+                    if len(chunk) == 0:
+                        break
+                    fp.write(chunk)
+            try:
+                os.rename(tmp_filename, filename)
+            except OSError:  # FAT überschreibt beim Umbenennen keine vorhandenen Dateien
+                os.remove(filename)
+                os.rename(tmp_filename, filename)
+        except Exception:
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            raise
+
+    def _create_runner(self, filename: str, writer) -> UPYCodeRunner:
+        """Erzeugt den Runner für den nächsten Job der Warteschlange."""
+        self.code_runner = UPYCodeRunner(filename, writer, self.output_overflow, self.output_queue_bytes,
+                                         self.output_replay_bytes, self.compile_cache)
+        self.run_history.add(self.code_runner.stats)
+        return self.code_runner
+
+    async def _run_python_file(self, filename: str, writer: UPYStreamWriter) -> UPYJob:
+        """Startet eine Python-Datei sofort (vor allen wartenden Jobs) und sendet deren Output in Echtzeit zurück."""
+        return await self.jobs.submit(filename, writer=writer, preempt=True)
+
+    async def _endpoint_run_py_file(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        filename = request.query.get("file", "")
+        if not filename.endswith(".py"):
+            return 400, "Parameter 'file' must name a .py file"
+        last_event_id = request.header("last-event-id")
+        if last_event_id is not None:
+            # EventSource verbindet nach einem Abbruch neu: fortsetzen statt das Skript erneut zu starten
+            if self.code_runner is None or self.code_runner.filename != filename:
+                await writer.send_headers(204, ())  # 204 beendet die automatische Wiederverbindung des Browsers
+                return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+            return await self._attach_output(writer, last_event_id)
+        await writer.send_headers(200, self._EVENT_STREAM_HEADERS)
         await self._run_python_file(filename, writer)
         return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.STREAM
 
-    async def _endpoint_stop_py_file(self, request: str, writer: UPYStreamWriter) -> Tuple[int, str]:
-        if self.code_runner is not None:
-            await self.code_runner.stop_and_wait()
-        return 200, "Stopped"
+    async def _endpoint_output(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        """Hängt sich an die Ausgabe des aktuellen (oder zuletzt beendeten) Skripts an."""
+        if self.code_runner is None:
+            return 404, "No script has been started"
+        return await self._attach_output(writer, request.header("last-event-id") or request.query.get("since", "0"))
+
+    async def _endpoint_runs(self, _: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+        """Messwerte der letzten Skriptläufe als JSON, ältester zuerst."""
+        await writer.send_response(200, json.dumps(self.run_history.to_list()), "application/json")
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_logs(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        """Einträge aus `logfile.log`, ohne die ganze Datei zu lesen.
+
+        `tail=<n>` liefert die letzten n Einträge (Standard 100), `since=<offset>` alles
+        ab einem Byte-Offset, `after=<zeit>` alles ab einer Zeit der Geräteuhr. Der
+        Header `X-Log-End` nennt den Offset für das nächste `since`. Mit `follow=1`
+        kommen neue Einträge als Event-Stream. `level` filtert (z. B. `WARNING`).
+        """
+        if self.log_reader is None:
+            return 501, "Log queries need the text log backend"
+        query = request.query
+        level = query.get("level", "DEBUG").upper()
+        if level not in LEVELS:
+            return 400, f"Unknown level '{level}'"
+        min_level = LEVELS[level]
+        if query.get("follow"):
+            try:
+                last_seq = int(request.header("last-event-id") or "0")
+                if last_seq < 0:
+                    raise ValueError(last_seq)
+            except ValueError:
+                return 400, "Invalid event id"
+            await writer.send_headers(200, self._EVENT_STREAM_HEADERS)
+            self.log_reader.follow(writer, last_seq, min_level)
+            return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.STREAM
+        end = self.log_reader.end
+        try:
+            if "since" in query or "after" in query:
+                since = int(query.get("since", "0"))
+                after = float(query["after"]) if "after" in query else None
+                if since < 0:
+                    raise ValueError(since)
+                records = self.log_reader.select(since if since <= end else 0, end, min_level, after)
+            else:
+                count = int(query.get("tail", "100"))
+                if count < 1:
+                    raise ValueError(count)
+                records = self.log_reader.tail(count, end, min_level)
+        except ValueError:
+            return 400, "Parameters 'tail' (at least 1), 'since' (not negative) and 'after' must be numbers"
+        writer.keep_alive = False  # Länge ist vorab unbekannt, Ende über das Schließen
+        await writer.send_headers(200, (("Content-Type", "text/plain"), ("X-Log-End", end)))
+        await self.log_reader.send(writer, records)
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_log_levels(self, _: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+        """Level der Teilsysteme und Rate der Sampler als JSON."""
+        await writer.send_response(200, json.dumps({"levels": get_levels(), "sampling": get_sampling()}),
+                                   "application/json")
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_set_log_levels(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        """Setzt Level (`http=DEBUG`) und Sampling (`runner.output=10`: jeder zehnte Eintrag) zur Laufzeit."""
+        for name, value in request.query.items():
+            try:
+                if "." in name:
+                    set_sampling(name, int(value))
+                else:
+                    set_level(name, value.upper())
+            except (KeyError, ValueError):
+                return 400, f"Invalid setting {name}={value}"
+        return await self._endpoint_log_levels(request, writer)
+
+    async def _attach_output(self, writer: UPYStreamWriter, last_event_id: str,
+                             runner: UPYCodeRunner = None) -> Tuple[int, str]:
+        try:
+            last_seq = int(last_event_id)
+            if last_seq < 0:
+                raise ValueError(last_seq)
+        except ValueError:
+            return 400, "Invalid event id"
+        await writer.send_headers(200, self._EVENT_STREAM_HEADERS)
+        (runner or self.code_runner).subscribe(writer, last_seq)
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.STREAM
+
+    async def _endpoint_submit_job(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        """Reiht eine Datei in die Warteschlange ein und antwortet mit dem Job als JSON."""
+        filename = request.query.get("file", "")
+        if not filename.endswith(".py"):
+            return 400, "Parameter 'file' must name a .py file"
+        try:
+            job = await self.jobs.submit(filename, request.query.get("priority", "0"), request.query.get("time_limit"))
+        except ValueError:
+            return 400, "Parameters 'priority' and 'time_limit' must be numbers, 'time_limit' positive"
+        await writer.send_response(201, json.dumps(job.to_dict()), "application/json")
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_list_jobs(self, _: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+        await writer.send_response(200, json.dumps(self.jobs.to_list()), "application/json")
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    def _find_job(self, request: UPYHTTPRequest) -> UPYJob:
+        try:
+            return self.jobs.get(int(request.params["id"]))
+        except ValueError:
+            return None
+
+    async def _endpoint_get_job(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        job = self._find_job(request)
+        if job is None:
+            return 404, "Unknown job"
+        await writer.send_response(200, json.dumps(job.to_dict()), "application/json")
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_cancel_job(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        job = self._find_job(request)
+        if job is None:
+            return 404, "Unknown job"
+        if not await self.jobs.cancel(job.job_id):
+            return 409, f"Job already {job.status}"
+        await writer.send_response(200, json.dumps(job.to_dict()), "application/json")
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    async def _endpoint_job_output(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        """Ausgabe eines Jobs als Event-Stream, solange sie noch vorgehalten wird."""
+        job = self._find_job(request)
+        if job is None:
+            return 404, "Unknown job"
+        if job.runner is None:
+            return 409, "Job has not started" if not job.finished else "Output is no longer available"
+        last_event_id = request.header("last-event-id") or request.query.get("since", "0")
+        return await self._attach_output(writer, last_event_id, job.runner)
+
+    async def _websocket_control(self, websocket: AlvikWebSocket, _: UPYHTTPRequest) -> None:
+        """Steuerkanal: JSON-Kommandos rein, Antworten und Script-Ausgabe als JSON-Events raus."""
+        output = AlvikWebSocketEventWriter(websocket)
+        while True:
+            message = await websocket.receive()
+            if message is None:
+                break
+            try:
+                command = json.loads(message)
+                callback = self._ws_commands.get(command.get("cmd"))
+                if callback is None:
+                    reply = {"event": "error", "data": f"Unknown command: {command.get('cmd')}"}
+                else:
+                    reply = await callback(command, output)
+            except Exception as e:
+                logger.error("WebSocket command failed: %s", e)
+                reply = {"event": "error", "data": str(e)}
+            if reply is not None:
+                await websocket.send(json.dumps(reply))
+
+    async def _ws_command_files(self, _: dict, __: AlvikWebSocketEventWriter) -> dict:
+        return {"event": "files", "data": self.file_index.names()}
+
+    async def _ws_command_run(self, command: dict, output: AlvikWebSocketEventWriter) -> dict:
+        filename = command.get("file", "")
+        if not filename.endswith(".py"):
+            return {"event": "error", "data": "Parameter 'file' must name a .py file"}
+        await self._run_python_file(filename, output)
+        return {"event": "started", "file": filename}
+
+    async def _ws_command_watch(self, command: dict, output: AlvikWebSocketEventWriter) -> dict:
+        if self.code_runner is None:
+            return {"event": "error", "data": "No script has been started"}
+        self.code_runner.subscribe(output, int(command.get("since", 0)))
+        return {"event": "watching", "file": self.code_runner.filename}
+
+    async def _ws_command_runs(self, _: dict, __: AlvikWebSocketEventWriter) -> dict:
+        return {"event": "runs", "data": self.run_history.to_list()}
+
+    async def _ws_command_submit(self, command: dict, output: AlvikWebSocketEventWriter) -> dict:
+        filename = command.get("file", "")
+        if not filename.endswith(".py"):
+            return {"event": "error", "data": "Parameter 'file' must name a .py file"}
+        writer = output if command.get("watch") else None
+        try:
+            job = await self.jobs.submit(filename, command.get("priority", 0), command.get("time_limit"), writer)
+        except ValueError:
+            return {"event": "error", "data": "Parameters 'priority' and 'time_limit' must be numbers, 'time_limit' positive"}
+        return {"event": "submitted", "data": job.to_dict()}
+
+    async def _ws_command_jobs(self, _: dict, __: AlvikWebSocketEventWriter) -> dict:
+        return {"event": "jobs", "data": self.jobs.to_list()}
+
+    async def _ws_command_cancel(self, command: dict, __: AlvikWebSocketEventWriter) -> dict:
+        job_id = int(command.get("id", 0))
+        return {"event": "cancelled", "id": job_id, "ok": await self.jobs.cancel(job_id)}
+
+    async def _ws_command_stop(self, _: dict, __: AlvikWebSocketEventWriter) -> dict:
+        return {"event": "stopped", "status": await self._stop_python_file()}
+
+    async def _stop_python_file(self) -> str:
+        """Stoppt den laufenden Job; wartende Jobs rücken danach nach."""
+        return await self.jobs.stop_current()
+
+    async def _endpoint_stop_py_file(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> Tuple[int, str]:
+        status = await self._stop_python_file()
+        if status == STOP_ABANDONED:
+            return 500, f"Script did not stop within {self.jobs.stop_timeout} s and was abandoned"
+        return 200, "Stopped" if status != STOP_NOT_RUNNING else "Not running"
 
 if __name__ == "__main__":
     bootloader = AlvikHTTPBootloader()
@@ -0,0 +1,97 @@
+from alvik_utils.utils import url_decode
+
+
+class _RouteNode:
+    """Knoten im Präfixbaum der Routen, ein Knoten pro Pfadsegment."""
+
+    def __init__(self):
+        self.children = {}  # statische Segmente
+        self.param_name = None  # `<name>`-Segment
+        self.param_child = None
+        self.callback = None  # Route endet genau hier
+        self.wildcard = None  # Route endet mit `*` (beliebiger Rest)
+
+
+class AlvikHTTPRouter:
+    """Kompilierte Routing-Tabelle für `AlvikHTTPServer`.
+
+    Routen ohne Platzhalter landen in einem Dictionary (`"GET /files"`), Routen mit
+    `<name>`-Segmenten oder abschließendem `*` in einem Präfixbaum pro HTTP-Methode.
+    Die Suche bricht beim ersten Treffer ab, die Kosten hängen nur von der Pfadtiefe ab.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._trees = {}
+
+    def add(self, endpoint_url: str, callback) -> None:
+        """Registriert eine Route der Form `"METHODE /pfad/<param>/*"`."""
+        method, path = endpoint_url.split(" ", 1)
+        if "?" in path:
+            raise ValueError(f"Query parameters are not part of a route: '{endpoint_url}'")
+        if "<" not in path and "*" not in path:
+            self._exact[f"{method} {path}"] = callback
+            return
+        node = self._trees.setdefault(method, _RouteNode())
+        segments = self._split(path)
+        for i, segment in enumerate(segments):
+            if segment == "*":
+                if i != len(segments) - 1:
+                    raise ValueError(f"Wildcard must be the last segment: '{endpoint_url}'")
+                node.wildcard = callback
+                return
+            if "*" in segment:
+                raise ValueError(f"Wildcard must be a whole segment: '{endpoint_url}'")
+            if segment.startswith("<") and segment.endswith(">"):
+                name = segment[1:-1]
+                if node.param_child is None:
+                    node.param_name = name
+                    node.param_child = _RouteNode()
+                elif node.param_name != name:
+                    raise ValueError(f"Conflicting parameter name '{name}' in '{endpoint_url}'")
+                node = node.param_child
+            else:
+                node = node.children.setdefault(segment, _RouteNode())
+        node.callback = callback
+
+    def match(self, method: str, path: str):
+        """Sucht die Route zu `method` und `path`.
+
+        @return (callback, params) oder (None, None), wenn keine Route passt.
+        """
+        callback = self._exact.get(f"{method} {path}")
+        if callback is not None:
+            return callback, {}
+        node = self._trees.get(method)
+        if node is None:
+            return None, None
+        params = {}
+        callback = self._match_node(node, self._split(path), 0, params)
+        if callback is None:
+            return None, None
+        return callback, params
+
+    def _match_node(self, node: _RouteNode, segments: list, index: int, params: dict):
+        if index == len(segments):
+            if node.callback is not None:
+                return node.callback
+        else:
+            segment = segments[index]
+            child = node.children.get(segment)
+            if child is not None:
+                callback = self._match_node(child, segments, index + 1, params)
+                if callback is not None:
+                    return callback
+            if node.param_child is not None and segment:
+                callback = self._match_node(node.param_child, segments, index + 1, params)
+                if callback is not None:
+                    params[node.param_name] = url_decode(segment)
+                    return callback
+        if node.wildcard is not None:
+            params["*"] = url_decode("/".join(segments[index:]))
+            return node.wildcard
+        return None
+
+    @staticmethod
+    def _split(path: str) -> list:
+        return path.split("/")[1:]
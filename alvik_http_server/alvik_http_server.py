@@ -1,9 +1,13 @@
-from asyncio import StreamReader
+from alvik_http_server.alvik_http_router import AlvikHTTPRouter
+from alvik_http_server.alvik_static_files import AlvikStaticFiles
+from alvik_http_server.alvik_websocket import AlvikWebSocket, CLOSE_GOING_AWAY
+from alvik_utils.upy_streamreader import UPYStreamReader, UPYHTTPRequest, HTTPError
 from alvik_utils.upy_streamwriter import UPYStreamWriter, HTTP_STATUS_CODES
-from alvik_utils.utils import get_error_message
+from alvik_utils.utils import get_error_message, ticks_ms, ticks_diff
 from alvik_wlan.alvik_wlan import AlvikWlan
 import socket
-from alvik_logger.logger import logger
+import logging
+from alvik_logger.logger import file_handler, get_logger, get_sampler
 try:
     import uasyncio as asyncio
 except ImportError:
@@ -14,10 +18,8 @@ except ImportError:
     Callable = None  # Platzhalter, da MicroPython kein `typing` hat
     Tuple = None
     Union = None
-try:
-    import ure  # Im ESP32 heißt das Regexmodul ure
-except ImportError:
-    import re as ure
+logger = get_logger("http")
+_request_sampler = get_sampler("http.request")  # Debug-Einträge pro Anfrage
 try:
     from arduino_alvik import ArduinoAlvik
     alvik = ArduinoAlvik() # um eine IP Adresse zu bekommen
@@ -30,6 +32,7 @@ class AlvikHTTPServer:
 
     class SPECIAL_RESPONSE_CODES:
         STREAM = 1111
+        SENT = 1112  # Endpoint hat die vollständige Antwort selbst gesendet, Verbindung bleibt nutzbar
 
     def __init__(self, filepath_index_html:str):
         """!
@@ -41,13 +44,47 @@ class AlvikHTTPServer:
         self._filepath_index_html = filepath_index_html
         self._ssid = ""
         self._password = ""
-        self._html:bytes = b""
         self._ip_address = "0.0.0.0"
-        self._registered_endpoints = {}
+        self._router = AlvikHTTPRouter()
+        self.block_size = 1024
+        self.max_header_size = 2048
+        self.request_timeout = 10
+        self.keep_alive_timeout = 5  # Sekunden, die eine Verbindung auf die nächste Anfrage wartet
+        self.max_requests_per_connection = 100
+        self.backlog = 5
+        # Admission Control: bei mehr als `max_connections` offenen Verbindungen (inkl. Streams)
+        # wird sofort mit 503 und Retry-After geantwortet
+        self.max_connections = 8
+        self.retry_after = 2
+        self.max_rejecting = 4  # gleichzeitig abgewiesene Clients, darüber wird ohne Antwort geschlossen
+        self.reject_read_timeout = 0.1  # Sekunden, die eine abgewiesene Anfrage angelesen wird
+        self._rejecting = 0
+        self.body_timeout = 60  # Sekunden für den gesamten Request-Body
+        self.write_timeout = 10  # Sekunden, nach denen ein hängender Schreibvorgang abgebrochen wird
+        self._connections = set()  # offene UPYStreamWriter
+        self._server = None
+        self._reaper_task = None
+        self._log_flush_task = None
+        self._stopping = False
+        self._shutdown_requested = None
+        self._drained = None
+        self._shutdown_handlers = []
+        self._websockets = set()
+        self.static_files = AlvikStaticFiles()
         self.add_endpoint("GET /", self._endpoint_get_index)
+        self.add_endpoint("HEAD /", self._endpoint_get_index)
 
-    async def _endpoint_get_index(self, _, __):
-        return self._html
+    async def _endpoint_get_index(self, request: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+        await self.static_files.serve_file(request, writer, self._filepath_index_html)
+        return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+
+    def add_static_directory(self, url_prefix: str, directory: str) -> None:
+        """Liefert alle Dateien aus `directory` unter `url_prefix` aus (z. B. "/static" -> "www"), auch per HEAD."""
+        async def _endpoint_static(request: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+            await self.static_files.serve_directory(request, writer, directory)
+            return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+        self.add_endpoint(f"GET {url_prefix.rstrip('/')}/*", _endpoint_static)
+        self.add_endpoint(f"HEAD {url_prefix.rstrip('/')}/*", _endpoint_static)
 
     def start_hotspot(self, ssid: str, password: str) -> str:
         self._ssid = ssid
@@ -57,104 +94,246 @@ class AlvikHTTPServer:
         self._ssid = ssid
         return AlvikWlan.connect_to_wifi(self._ssid, password)
 
-    def _read_index_html(self) -> None:
-        logger.info(f"Reading HTML file: '{self._filepath_index_html}'")
-        with open(self._filepath_index_html, "r") as fp:
-            self._html = fp.read().encode("UTF-8")
+    async def _receive_http_request(self, reader: UPYStreamReader, idle_timeout: float) -> UPYHTTPRequest:
+        request = await reader.read_request(idle_timeout)
+        if request is not None and logger.isEnabledFor(logging.DEBUG) and _request_sampler.sample():
+            logger.debug("Received request '%s %s' with %d Bytes of data", request.method, request.target,
+                         reader.bytes_received)
+        return request
 
-    async def _receive_entire_http_request(self, reader: StreamReader, block_size: int = 1024, timeout: int = 10) -> str:
-        request = b""
-        # TODO may add a timeout of 10 seconds
-        while True:
-            chunk = await reader.read(1024)
-            if not chunk:
-                break  # Verbindung wurde geschlossen
-            request += chunk
-            # Prüfe, ob die Anfrage vollständig ist (HTTP-Ende erreicht)
-            if b"\r\n\r\n" in request:
-                break
-        logger.debug(f"Received request with {len(request)} Bytes of data")
-        request_str = request.decode('utf-8')
-        return request_str
-
-    def add_endpoint(self, endpoint_url: str, callback: Callable[[str, socket], Union[str, Tuple[int, str], bytes]]):
+    def add_endpoint(self, endpoint_url: str, callback: Callable[[UPYHTTPRequest, UPYStreamWriter], Union[str, Tuple[int, str], bytes]]):
         """Registriert einen neuen Endpoint.
 
+         Der Callback bekommt die geparste Anfrage (`UPYHTTPRequest`), der Body kann über
+         `request.body` gestreamt werden. Pfad-Parameter aus `<name>`-Segmenten stehen in
+         `request.params`, Query-Parameter in `request.query`.
+
+         Beispiele: "GET /files", "GET /files/<name>", "GET /static/*"
+
          @return String -> HTTP Response mit HTTP Status Code 200
          @return (int, String) -> HTTP Repsonse mit HTTP Status Code (int)
          @return Bytes -> RAW-Response
         """
-        escaped = self._regex_escape(endpoint_url)  # Escaped alle Zeichen (z. B. / -> \/, . -> \.)
-        regex_with_wildcard = ure.sub(r'\\\*', r'.*', escaped)
-        self._registered_endpoints[endpoint_url] = {"callback": callback, "regex": ure.compile("^" + regex_with_wildcard + "$")}
+        self._router.add(endpoint_url, callback)
+
+    def add_websocket_endpoint(self, path: str, callback) -> None:
+        """Registriert einen WebSocket-Endpoint unter `GET path`.
+
+        Der Callback `callback(websocket: AlvikWebSocket, request: UPYHTTPRequest)` läuft für die
+        gesamte Lebensdauer der Verbindung, danach wird der WebSocket geschlossen.
+        """
+        async def _endpoint_websocket(request: UPYHTTPRequest, writer: UPYStreamWriter) -> int:
+            websocket = await AlvikWebSocket.accept(request, writer)
+            self._websockets.add(websocket)
+            try:
+                await callback(websocket, request)
+            finally:
+                self._websockets.discard(websocket)
+                await websocket.close()
+            return AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT
+        self.add_endpoint(f"GET {path}", _endpoint_websocket)
+
+    async def start(self, ip="0.0.0.0", port=80) -> None:
+        """Startet den Server und kehrt sofort zurück. Kann nach `stop()` erneut aufgerufen werden."""
+        if self._server is not None:
+            return
+        self._stopping = False
+        self._shutdown_requested = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_client, ip, port, backlog=self.backlog)
+        self._reaper_task = asyncio.create_task(self._reap_stalled_connections())
+        self._log_flush_task = asyncio.create_task(file_handler.flush_loop())
+        logger.info("Server running on http://%s:%d", ip, port)
+
+    async def serve(self, ip="0.0.0.0", port=80) -> None:
+        """Startet den Server und wartet ohne Polling, bis `request_shutdown()` oder `stop()` aufgerufen wird."""
+        await self.start(ip, port)
+        await self._shutdown_requested.wait()  # MicroPython hat kein serve_forever()
+        await self.stop()
+
+    def request_shutdown(self) -> None:
+        """Fordert das Beenden von `serve()` an, auch aus Endpoints oder anderen Tasks heraus."""
+        if self._shutdown_requested is not None:
+            self._shutdown_requested.set()
+
+    def add_shutdown_handler(self, callback) -> None:
+        """Registriert eine Coroutine-Funktion, die beim Herunterfahren vor dem Abwarten der Verbindungen läuft."""
+        self._shutdown_handlers.append(callback)
+
+    async def stop(self, timeout: float = 5) -> None:
+        """Fährt den Server geordnet herunter.
+
+        Nimmt keine neuen Verbindungen mehr an, schließt wartende Keep-Alive-Verbindungen,
+        lässt laufende Anfragen und Streams bis `timeout` Sekunden auslaufen und bricht
+        danach alle verbleibenden Verbindungen ab.
+        """
+        if self._server is None:
+            return
+        logger.info("Stopping server")
+        self._stopping = True
+        self._server.close()
+        for callback in self._shutdown_handlers:
+            try:
+                await asyncio.wait_for(callback(), timeout)
+            except Exception as e:
+                logger.error("Shutdown handler failed: %s", e)
+        for websocket in list(self._websockets):
+            await websocket.close(CLOSE_GOING_AWAY, "Server shutdown")
+        for writer in list(self._connections):
+            if writer.idle:
+                writer.abort()
+        if self._connections:
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Aborting %d connections after shutdown timeout", len(self._connections))
+                for writer in list(self._connections):
+                    writer.abort()  # meldet sich über `on_close` ab
+        self._reaper_task.cancel()
+        await self._server.wait_closed()
+        self._server = None
+        self._shutdown_requested.set()
+        logger.info("Server stopped")
+        self._log_flush_task.cancel()
+        file_handler.flush()
 
-    async def _start_async_web_server(self, ip="0.0.0.0", port=80):
-        server = await asyncio.start_server(self._handle_client, ip, port, backlog=5)
-        logger.info(f"Server running on http://{ip}:{port}")
+    def _connection_closed(self, writer: UPYStreamWriter) -> None:
+        self._connections.discard(writer)
+        if not self._connections:
+            self._drained.set()
+
+    async def _reap_stalled_connections(self) -> None:
+        """Bricht Verbindungen ab, deren Schreibvorgang länger als `write_timeout` hängt."""
         while True:
-            await asyncio.sleep(0.1)  # MicroPython hat kein serve_forever(), also brauchen wir eine Endlosschleife
+            await asyncio.sleep(1)
+            now = ticks_ms()
+            for writer in list(self._connections):
+                pending_since = writer.write_pending_since
+                if pending_since is not None and ticks_diff(now, pending_since) > self.write_timeout * 1000:
+                    logger.warning("Closing stalled connection")
+                    writer.abort()  # meldet sich über `on_close` ab
 
+    async def _reject_client(self, reader, writer: UPYStreamWriter) -> None:
+        if self._rejecting >= self.max_rejecting:
+            writer.abort()  # auch Absagen kosten Speicher, bei einem Ansturm nur noch schließen
+            return
+        logger.warning("Server busy (%d connections), rejecting client with 503", len(self._connections))
+        self._rejecting += 1
+        try:
+            try:
+                # Anfrage kurz anlesen, sonst setzt das Schließen mit ungelesenen Daten die Verbindung zurück,
+                # bevor der Client die Antwort gelesen hat
+                await asyncio.wait_for(reader.read(self.block_size), self.reject_read_timeout)
+            except (asyncio.TimeoutError, OSError):
+                pass
+            try:
+                await writer.send_response(503, "Server busy", headers=(("Retry-After", self.retry_after),))
+            except OSError:
+                writer.abort()
+        finally:
+            self._rejecting -= 1
 
     async def _handle_client(self, reader, writer):
-        logger.info(f"Client connected.")
-        response_content = None
+        """Bearbeitet alle Anfragen einer (Keep-Alive-)Verbindung nacheinander.
+
+        Anfragen, die der Client per Pipelining schon mitgeschickt hat, bleiben im
+        Puffer des `UPYStreamReader` und werden in der nächsten Runde gelesen.
+        """
+        logger.debug("Client connected.")
+        writer = UPYStreamWriter(writer)
+        if len(self._connections) >= self.max_connections:
+            await self._reject_client(reader, writer)
+            return
+        self._connections.add(writer)
+        writer.on_close = self._connection_closed
+        stream = UPYStreamReader(reader, self.block_size, self.max_header_size, self.request_timeout,
+                                 self.body_timeout)
+        handled_requests = 0
+        is_stream = False
         try:
-            request_str = await self._receive_entire_http_request(reader)
-            writer = UPYStreamWriter(writer)
-            if len(request_str) == 0:
-                logger.debug("No data received")
-                await writer.aclose()
-                return
-            request_line = request_str.split("\r\n")[0]
-            method, path, _ = request_line.split(" ", 2)
-            endpoint = f"{method} {path}"
-            matches = [v for k, v in self._registered_endpoints.items() if self._regex_fullmatch(v['regex'], endpoint)]
-            if len(matches) > 0 and matches[0] is not None:
-                logger.debug(f"Handling request for {endpoint}")
-                response_content = await matches[0]["callback"](request_str, writer)
+            while True:
+                writer.idle = True  # darf beim Herunterfahren sofort geschlossen werden
+                request = await self._receive_http_request(
+                    stream, self.keep_alive_timeout if handled_requests else self.request_timeout)
+                writer.idle = False
+                if request is None:
+                    logger.debug("No data received")
+                    break
+                handled_requests += 1
+                writer.keep_alive = self._wants_keep_alive(request) and not self._stopping and \
+                    handled_requests < self.max_requests_per_connection
+                response_content = await self._handle_request(request, writer)
                 if response_content == AlvikHTTPServer.SPECIAL_RESPONSE_CODES.STREAM:
+                    is_stream = True
                     return # in case of streams we can not close the writer!
-                elif isinstance(response_content, bytes):
-                    await writer.awrite(response_content)  # RAW Response
-                elif isinstance(response_content, tuple) and len(response_content) == 2 and \
-                        isinstance(response_content[0], int) and isinstance(response_content[1], str):
-                    await writer.send_response(response_content[0], response_content[1])  # HTTP Response StatusCode, Message
-                elif isinstance(response_content, str):
-                    await writer.send_response(200, response_content)  # HTTP Response 200, Message
-                else:
-                    logger.error("Wrong return value of endpoint")
-                    raise ValueError("Wrong return value of endpoint")
-            else:
-                logger.error(f"Endpoint {endpoint} not found")
-                await writer.send_response(404, "Endpoint not found")
+                if not writer.keep_alive:
+                    break
+                await request.body.drain()  # ungelesenen Body verwerfen, bevor die nächste Anfrage gelesen wird
+        except HTTPError as e:
+            logger.warning("Invalid request: %d %s", e.status, e.message)
+            writer.keep_alive = False
+            await self._send_error(writer, e.status, e.message)
         except Exception as e:
             error_trace = get_error_message(e)
-            logger.error(f"Handling endpoint request failed with Error: {str(e)}\n{error_trace}\n".encode("utf-8"))
-            await writer.send_response(500, f"Error: {str(e)}")
+            logger.error("Handling endpoint request failed with Error: %s\n%s", e, error_trace)
+            writer.keep_alive = False
+            await self._send_error(writer, 500, f"Error: {str(e)}")
         finally:
-            logger.info("Client request handled.")
-            if response_content != AlvikHTTPServer.SPECIAL_RESPONSE_CODES.STREAM:
+            logger.debug("Client connection handled (%d requests).", handled_requests)
+            if not is_stream:
                 await writer.aclose()
 
+    @staticmethod
+    async def _send_error(writer: UPYStreamWriter, http_status_code: int, message: str) -> None:
+        if writer.closed:
+            return
+        try:
+            await writer.send_response(http_status_code, message)
+        except OSError:
+            pass  # Client ist nicht mehr erreichbar
+
+    async def _handle_request(self, request: UPYHTTPRequest, writer: UPYStreamWriter):
+        """Ruft den passenden Endpoint auf und sendet dessen Antwort."""
+        callback, params = self._router.match(request.method, request.path)
+        if callback is None:
+            logger.error("Endpoint %s %s not found", request.method, request.path)
+            await writer.send_response(404, "Endpoint not found")
+            return None
+        request.params = params
+        logger.debug("Handling request for %s %s", request.method, request.path)
+        response_content = await callback(request, writer)
+        if response_content == AlvikHTTPServer.SPECIAL_RESPONSE_CODES.STREAM or \
+                response_content == AlvikHTTPServer.SPECIAL_RESPONSE_CODES.SENT:
+            pass
+        elif isinstance(response_content, bytes):
+            writer.keep_alive = False  # RAW Response hat keine Content-Length, Ende nur über das Schließen
+            await writer.awrite(response_content)  # RAW Response
+        elif isinstance(response_content, tuple) and len(response_content) == 2 and \
+                isinstance(response_content[0], int) and isinstance(response_content[1], str):
+            await writer.send_response(response_content[0], response_content[1])  # HTTP Response StatusCode, Message
+        elif isinstance(response_content, str):
+            await writer.send_response(200, response_content)  # HTTP Response 200, Message
+        else:
+            logger.error("Wrong return value of endpoint")
+            raise ValueError("Wrong return value of endpoint")
+        return response_content
+
+    @staticmethod
+    def _wants_keep_alive(request: UPYHTTPRequest) -> bool:
+        connection = request.header("connection", "").lower()
+        if request.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
     def start_web_server(self, ip="0.0.0.0", port=80):
         """!
         Startet den Webserver zur Steuerung des Alvik-Roboters.
 
         @param ip Die IP-Adresse des Geräts.
         """
-        self._read_index_html()
-        asyncio.run(self._start_async_web_server(ip, port))
-
-
-    def _regex_escape(self, s: str) -> str:
-        """Escape für reguläre Ausdrücke in MicroPython (ersetzt `re.escape()`)."""
-        special_chars = r".^$*+?{}[]\|()"
-        return "".join("\\" + c if c in special_chars else c for c in s)
+        asyncio.run(self.serve(ip, port))
 
-    def _regex_fullmatch(self, pattern, string):
-        """Ersatz für `re.fullmatch()` in MicroPython."""
-        match = ure.match(pattern, string)  # Prüfe, ob es einen Anfangs-Match gibt
-        return match is not None
 
 if __name__ == "__main__":
     controller = AlvikHTTPServer("../bootloader_index.html")
@@ -0,0 +1,116 @@
+import os
+import time
+from alvik_utils.upy_streamreader import UPYHTTPRequest
+from alvik_utils.upy_streamwriter import UPYStreamWriter
+from alvik_utils.utils import etag_matches
+
+CONTENT_TYPES = {
+    "html": "text/html; charset=utf-8",
+    "htm": "text/html; charset=utf-8",
+    "css": "text/css",
+    "js": "application/javascript",
+    "json": "application/json",
+    "txt": "text/plain; charset=utf-8",
+    "py": "text/plain; charset=utf-8",
+    "log": "text/plain; charset=utf-8",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "svg": "image/svg+xml",
+    "ico": "image/x-icon",
+}
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+_S_IFDIR = 0x4000
+
+
+def http_date(timestamp: int) -> str:
+    """Formatiert einen Zeitstempel als HTTP-Datum (`Wed, 21 Oct 2015 07:28:00 GMT`)."""
+    t = time.gmtime(timestamp)
+    return f"{_WEEKDAYS[t[6]]}, {t[2]:02d} {_MONTHS[t[1] - 1]} {t[0]} {t[3]:02d}:{t[4]:02d}:{t[5]:02d} GMT"
+
+
+class AlvikStaticFiles:
+    """Liefert Dateien aus dem Flash in festen Blöcken aus.
+
+    Liegt neben einer Datei eine vorkomprimierte `.gz`-Variante und akzeptiert der
+    Client gzip, wird diese gesendet. Über ETag und Last-Modified werden bedingte
+    Anfragen mit 304 beantwortet, ohne die Datei zu lesen.
+    """
+
+    def __init__(self, chunk_size: int = 1024, max_age: int = 0):
+        self.chunk_size = chunk_size
+        self.max_age = max_age  # 0 -> Browser muss immer per ETag nachfragen
+
+    @staticmethod
+    def _stat(filepath: str):
+        try:
+            return os.stat(filepath)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _content_type(filepath: str) -> str:
+        extension = filepath.rsplit(".", 1)[-1].lower() if "." in filepath else ""
+        return CONTENT_TYPES.get(extension, "application/octet-stream")
+
+    @staticmethod
+    async def _send_error(request: UPYHTTPRequest, writer: UPYStreamWriter, http_status_code: int, message: str):
+        if request.method == "HEAD":
+            await writer.send_headers(http_status_code, (("Content-Type", "text/plain"),), len(message))
+        else:
+            await writer.send_response(http_status_code, message)
+
+    async def serve_file(self, request: UPYHTTPRequest, writer: UPYStreamWriter, filepath: str) -> None:
+        """Sendet `filepath` als vollständige HTTP-Antwort, bei HEAD nur die Header."""
+        stat = self._stat(filepath)
+        if stat is not None and stat[0] & _S_IFDIR:
+            filepath = filepath.rstrip("/") + "/index.html"
+            stat = self._stat(filepath)
+
+        headers = [("Content-Type", self._content_type(filepath)), ("Vary", "Accept-Encoding")]
+        if "gzip" in request.header("accept-encoding", ""):
+            gz_stat = self._stat(filepath + ".gz")
+            if gz_stat is not None:
+                filepath, stat = filepath + ".gz", gz_stat
+                headers.append(("Content-Encoding", "gzip"))
+        if stat is None:
+            await self._send_error(request, writer, 404, "File not found")
+            return
+
+        size, mtime = stat[6], stat[8]
+        etag = f'"{size:x}-{mtime:x}"'
+        last_modified = http_date(mtime)
+        headers.append(("ETag", etag))
+        headers.append(("Last-Modified", last_modified))
+        headers.append(("Cache-Control", f"max-age={self.max_age}" if self.max_age else "no-cache"))
+
+        if_none_match = request.header("if-none-match")
+        if if_none_match is not None:
+            not_modified = etag_matches(if_none_match, etag)
+        else:
+            not_modified = request.header("if-modified-since") == last_modified
+        if not_modified:
+            await writer.send_headers(304, headers)
+            return
+
+        await writer.send_headers(200, headers, size)
+        if request.method == "HEAD":
+            return
+        buf = bytearray(self.chunk_size)
+        mv = memoryview(buf)
+        with open(filepath, "rb") as fp:
+            while True:
+                n = fp.readinto(buf)
+                if not n:
+                    break
+                await writer.awrite(mv[:n])
+
+    async def serve_directory(self, request: UPYHTTPRequest, writer: UPYStreamWriter, directory: str) -> None:
+        """Sendet die Datei `request.params["*"]` aus `directory`."""
+        relative_path = request.params.get("*", "")
+        if ".." in relative_path.split("/"):
+            await self._send_error(request, writer, 403, "Forbidden")
+            return
+        await self.serve_file(request, writer, directory.rstrip("/") + "/" + relative_path)
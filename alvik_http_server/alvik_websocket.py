@@ -0,0 +1,201 @@
+import json
+from binascii import b2a_base64
+try:
+    from hashlib import sha1
+except ImportError:
+    from uhashlib import sha1
+from alvik_utils.upy_streamreader import UPYHTTPRequest, UPYStreamReader, HTTPError
+from alvik_utils.upy_streamwriter import UPYStreamWriter
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+_OPCODES = (OPCODE_CONTINUATION, OPCODE_TEXT, OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG)
+
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_INVALID_DATA = 1007
+CLOSE_MESSAGE_TOO_BIG = 1009
+
+
+class AlvikWebSocket:
+    """WebSocket-Verbindung (RFC 6455) auf einer bestehenden HTTP-Verbindung.
+
+    Ping, Pong und Close werden in `receive()` automatisch beantwortet.
+    """
+
+    def __init__(self, stream: UPYStreamReader, writer: UPYStreamWriter, max_message_size: int = 4096):
+        self._stream = stream
+        self._stream.timeout = None  # WebSockets dürfen beliebig lange ruhen
+        self._writer = writer
+        self._header = bytearray(10)
+        self.max_message_size = max_message_size
+        self.closed = False
+
+    @staticmethod
+    async def accept(request: UPYHTTPRequest, writer: UPYStreamWriter,
+                     max_message_size: int = 4096) -> "AlvikWebSocket":
+        """Beantwortet den Upgrade-Request mit 101 und gibt die WebSocket-Verbindung zurück."""
+        key = request.header("sec-websocket-key")
+        if request.header("upgrade", "").lower() != "websocket" or not key:
+            raise HTTPError(400, "WebSocket upgrade expected")
+        if request.header("sec-websocket-version") != "13":
+            raise HTTPError(426, "WebSocket version 13 required")
+        accept = b2a_base64(sha1((key + _WEBSOCKET_GUID).encode()).digest()).strip()
+        writer.keep_alive = False  # nach dem WebSocket wird keine HTTP-Anfrage mehr gelesen
+        await writer.send_headers(101, (("Upgrade", "websocket"), ("Sec-WebSocket-Accept", accept)),
+                                  connection="Upgrade")
+        return AlvikWebSocket(request.stream, writer, max_message_size)
+
+    async def _read_exact(self, size: int) -> bytearray:
+        buf = bytearray(size)
+        mv = memoryview(buf)
+        pos = 0
+        while pos < size:
+            n = await self._stream.readinto(mv[pos:])
+            if n == 0:
+                raise OSError("WebSocket connection closed")
+            pos += n
+        return buf
+
+    async def _send_frame(self, opcode: int, payload) -> None:
+        length = len(payload)
+        header = self._header
+        header[0] = 0x80 | opcode  # FIN, Server-Frames sind nie maskiert
+        if length < 126:
+            header[1] = length
+            header_length = 2
+        elif length < 65536:
+            header[1] = 126
+            header[2] = length >> 8
+            header[3] = length & 0xFF
+            header_length = 4
+        else:
+            header[1] = 127
+            for i in range(8):
+                header[2 + i] = (length >> (56 - 8 * i)) & 0xFF
+            header_length = 10
+        await self._writer.awritev(memoryview(header)[:header_length], payload)
+
+    async def send(self, data) -> None:
+        """Sendet `str` als Text- und `bytes` als Binärnachricht."""
+        if isinstance(data, str):
+            await self._send_frame(OPCODE_TEXT, data.encode("utf-8"))
+        else:
+            await self._send_frame(OPCODE_BINARY, data)
+
+    async def ping(self, data: bytes = b"") -> None:
+        await self._send_frame(OPCODE_PING, data)
+
+    async def close(self, code: int = CLOSE_NORMAL, reason: str = "") -> None:
+        """Sendet einen Close-Frame. Die Antwort des Clients wird von `receive()` gelesen."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._send_frame(OPCODE_CLOSE, bytes((code >> 8, code & 0xFF)) + reason.encode("utf-8"))
+        except OSError:
+            pass
+
+    async def receive(self):
+        """Wartet auf die nächste Nachricht.
+
+        @return str (Text), bytes (Binär) oder None, wenn die Verbindung geschlossen wurde.
+        """
+        message = None
+        message_opcode = OPCODE_TEXT
+        try:
+            while True:
+                head = await self._read_exact(2)
+                fin = head[0] & 0x80
+                opcode = head[0] & 0x0F
+                length = head[1] & 0x7F
+                if not head[1] & 0x80:
+                    await self.close(CLOSE_PROTOCOL_ERROR, "Client frames must be masked")
+                    return None
+                if head[0] & 0x70:  # RSV1-3 ohne ausgehandelte Erweiterung
+                    await self.close(CLOSE_PROTOCOL_ERROR, "Reserved bits set")
+                    return None
+                if opcode not in _OPCODES:
+                    await self.close(CLOSE_PROTOCOL_ERROR, "Reserved opcode")
+                    return None
+                if opcode & 0x08 and (length > 125 or not fin):
+                    await self.close(CLOSE_PROTOCOL_ERROR, "Invalid control frame")
+                    return None
+                if length == 126:
+                    ext = await self._read_exact(2)
+                    length = (ext[0] << 8) | ext[1]
+                elif length == 127:
+                    length = int.from_bytes(await self._read_exact(8), "big")
+                if length + (len(message) if message is not None else 0) > self.max_message_size:
+                    await self.close(CLOSE_MESSAGE_TOO_BIG)
+                    return None
+                mask = await self._read_exact(4)
+                payload = await self._read_exact(length) if length else bytearray()
+                for i in range(length):
+                    payload[i] ^= mask[i & 3]
+
+                if opcode == OPCODE_CLOSE:
+                    if not self.closed:
+                        code = (payload[0] << 8) | payload[1] if length >= 2 else CLOSE_NORMAL
+                        await self.close(code)
+                    return None
+                # Kontrollframes dürfen zwischen den Fragmenten einer Nachricht liegen
+                if opcode == OPCODE_PING:
+                    await self._send_frame(OPCODE_PONG, payload)
+                    continue
+                if opcode == OPCODE_PONG:
+                    continue
+                if opcode == OPCODE_CONTINUATION:
+                    if message is None:
+                        await self.close(CLOSE_PROTOCOL_ERROR, "Unexpected continuation frame")
+                        return None
+                    message.extend(payload)
+                elif message is not None:
+                    await self.close(CLOSE_PROTOCOL_ERROR, "Expected continuation frame")
+                    return None
+                else:
+                    message_opcode = opcode
+                    message = payload
+                if fin:
+                    if message_opcode != OPCODE_TEXT:
+                        return bytes(message)
+                    try:
+                        return message.decode("utf-8")
+                    except UnicodeError:
+                        await self.close(CLOSE_INVALID_DATA, "Invalid UTF-8")
+                        return None
+        except OSError:
+            self.closed = True
+            return None
+
+
+class AlvikWebSocketEventWriter:
+    """Sendet die Ausgabe eines `LiveStream` als JSON-Nachrichten über einen WebSocket.
+
+    Gegenstück zu `UPYStreamWriter.send_event()` für Server-Sent-Events:
+    `{"event": "output", "data": "..."}` pro Ausgabe(-Block) und `{"event": "exit"}` am Ende.
+    """
+
+    def __init__(self, websocket: AlvikWebSocket):
+        self._websocket = websocket
+
+    async def send_event(self, data: str) -> None:
+        await self._websocket.send(json.dumps({"event": "output", "data": data}))
+
+    async def send_events(self, lines, event_id: int = None) -> None:
+        """Mehrere Ausgaben in einer Nachricht, in `data` durch `\n` getrennt."""
+        message = {"event": "output", "data": "\n".join(lines)}
+        if event_id is not None:
+            message["id"] = event_id
+        await self._websocket.send(json.dumps(message))
+
+    async def end_events(self) -> None:
+        if not self._websocket.closed:
+            await self._websocket.send(json.dumps({"event": "exit"}))
@@ -1,23 +1,57 @@
 import logging
-try:
-    from logging.handlers import RotatingFileHandler
-except ImportError:
-    from alvik_logger.upy_logging_handler import RotatingFileHandler
+from alvik_utils.utils import is_micropython
+from alvik_logger.upy_binary_log import BinaryRingLogHandler
+from alvik_logger.upy_logging_handler import BufferedRotatingFileHandler
+
+LOG_BACKEND = "text"  # "text": logfile.log als Klartext, "binary": Ringdatei logfile.alog (tools/decode_binary_log.py)
+LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR,
+          "CRITICAL": logging.CRITICAL}
+# Teilsysteme mit eigenem, zur Laufzeit änderbarem Level (`set_level()`, Endpoint `/logs/levels`)
+SUBSYSTEM_LEVELS = {"http": logging.INFO, "runner": logging.INFO, "wlan": logging.INFO, "fs": logging.INFO}
+
+
+class _TemplateLogger(logging.Logger):
+    """Logger für MicroPython, der Vorlage und Argumente im Record behält.
+
+    micropython-lib formatiert `msg % args` schon in `Logger.log()` und der Record
+    kennt danach nur `message`. `BinaryRingLogHandler` braucht aber `msg` und `args`,
+    um Vorlagen nur einmal zu speichern. Unter CPython haben Records beides ohnehin.
+    """
+
+    def log(self, level, msg, *args):
+        if not self.isEnabledFor(level):
+            return
+        if args and isinstance(args[0], dict):
+            args = args[0]
+        record = self.record  # micropython-lib verwendet einen Record je Logger wieder
+        record.set(self.name, level, msg % args if args else msg)
+        record.msg = msg
+        record.args = args
+        for handler in self.handlers:
+            handler.emit(record)
+
+
+def _create_logger(name: str):
+    return _TemplateLogger(name) if is_micropython() else logging.getLogger(name)
+
 
 # Logger erstellen
-logger = logging.getLogger("ALVIKLogger")
+logger = _create_logger("ALVIKLogger")
 logger.setLevel(logging.DEBUG)  # Alle Log-Level zulassen
 
 # Format für Logs
-log_format = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+log_format = logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
 
 # StreamHandler für die Konsole
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.DEBUG)  # Nur INFO und höher in die Konsole
 console_handler.setFormatter(log_format)
 
-# RotatingFileHandler (Max. 1000 KB pro Datei, 2 Backups)
-file_handler = RotatingFileHandler("logfile.log", maxBytes=1000000, backupCount=0, encoding="utf-8")
+# Datei-Handler schreibt gepuffert; `flush_loop()` startet der Webserver
+if LOG_BACKEND == "binary":
+    file_handler = BinaryRingLogHandler("logfile.alog", ring_bytes=64 * 1024)  # Ring fester Größe, keine Rotation
+else:
+    file_handler = BufferedRotatingFileHandler("logfile.log", maxBytes=1000000, backupCount=0, encoding="utf-8")  # Max. 1000 KB, keine Backups
 file_handler.setLevel(logging.DEBUG)  # Alles (DEBUG und höher) in die Datei
 file_handler.setFormatter(log_format)
 
@@ -25,6 +59,88 @@ file_handler.setFormatter(log_format)
 logger.addHandler(console_handler)
 logger.addHandler(file_handler)
 
+_subsystem_loggers = {}
+_samplers = {}
+
+
+def get_logger(subsystem: str):
+    """Logger eines Teilsystems (`SUBSYSTEM_LEVELS`), z. B. `get_logger("http")`.
+
+    Meldungen mit %-Argumenten übergeben (`log.debug("%d Bytes", n)`), damit bei
+    abgeschaltetem Level nichts formatiert wird; teure Argumente zusätzlich mit
+    `log.isEnabledFor(...)` absichern.
+    """
+    sub_logger = _subsystem_loggers.get(subsystem)
+    if sub_logger is None:
+        sub_logger = _create_logger(subsystem)
+        sub_logger.setLevel(SUBSYSTEM_LEVELS.get(subsystem, logging.INFO))
+        # Handler direkt anhängen: MicroPython kennt keine Logger-Hierarchie
+        sub_logger.handlers = [console_handler, file_handler]
+        sub_logger.propagate = False
+        _subsystem_loggers[subsystem] = sub_logger
+    return sub_logger
+
+
+def set_level(subsystem: str, level: str) -> None:
+    """Setzt das Level eines Teilsystems zur Laufzeit.
+
+    @raise KeyError bei unbekanntem Teilsystem oder Level.
+    """
+    if subsystem not in SUBSYSTEM_LEVELS:
+        raise KeyError(subsystem)
+    SUBSYSTEM_LEVELS[subsystem] = LEVELS[level]
+    get_logger(subsystem).setLevel(LEVELS[level])
+
+
+def get_levels() -> dict:
+    names = {value: name for name, value in LEVELS.items()}
+    return {subsystem: names.get(level, level) for subsystem, level in SUBSYSTEM_LEVELS.items()}
+
+
+class LogSampler:
+    """Lässt von häufigen Einträgen nur jeden `every`-ten durch.
+
+        if log.isEnabledFor(logging.DEBUG) and sampler.sample():
+            log.debug(...)
+    """
+
+    def __init__(self, every: int = 1):
+        self.every = every
+        self.suppressed = 0  # seit Start ausgelassene Einträge
+        self._count = 0
+
+    def sample(self) -> bool:
+        self._count += 1
+        if self._count >= self.every:
+            self._count = 0
+            return True
+        self.suppressed += 1
+        return False
+
+
+def get_sampler(name: str, every: int = 1) -> LogSampler:
+    """Benannter Sampler, dessen Rate per `/logs/levels` änderbar ist (`every` gilt nur beim ersten Aufruf)."""
+    sampler = _samplers.get(name)
+    if sampler is None:
+        sampler = _samplers[name] = LogSampler(every)
+    return sampler
+
+
+def set_sampling(name: str, every: int) -> None:
+    """Ändert die Rate eines vorhandenen Samplers zur Laufzeit.
+
+    @raise KeyError bei unbekanntem Sampler, ValueError wenn `every` kleiner als 1 ist.
+    """
+    if name not in _samplers:
+        raise KeyError(name)
+    if every < 1:
+        raise ValueError(every)
+    _samplers[name].every = every
+
+
+def get_sampling() -> dict:
+    return {name: {"every": sampler.every, "suppressed": sampler.suppressed} for name, sampler in _samplers.items()}
+
 
 def logger_test():
   logger.debug("Das ist eine Debug-Nachricht.")
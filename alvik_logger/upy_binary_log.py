@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import _thread
+import struct
+import logging
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+# Aufbau der Datei (little endian):
+#   Header (HEADER_SIZE Bytes): Magic, Version, Epochenjahr der Geräteuhr, Ringgröße,
+#     head (nächste Schreibposition), tail (ältester Eintrag), Zeit des neuesten
+#     Eintrags in ms, Anzahl Einträge. Positionen sind relativ zum Datenbereich.
+#   Datenbereich (ring_bytes): Einträge der Form
+#     u16 Länge | u8 Level | Varint Zeitabstand zum vorigen Eintrag in ms (Zickzack)
+#     | Varint Template-ID | Argumente
+#   Template-ID 0 bedeutet: es folgt der fertige Text (Varint Länge + UTF-8). Andere
+#   IDs verweisen auf `<datei>.tpl`, eine Zeile `[id, "template"]` (JSON) je Template.
+#   Argumente beginnen mit einem Typ-Byte (ARG_*). Passt ein Eintrag nicht mehr ans
+#   Ende des Rings, markiert eine Länge 0 den Sprung zum Anfang.
+MAGIC = b"ALOG"
+VERSION = 1
+HEADER_FORMAT = "<4sBHBIIIQI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+WRAP_MARKER = 0
+INLINE_TEXT = 0
+ARG_INT = ord("i")
+ARG_FLOAT = ord("f")
+ARG_STR = ord("s")
+ARG_NONE = ord("n")
+ARG_TRUE = ord("T")
+ARG_FALSE = ord("F")
+_MAX_RECORD = 0xFFFF
+
+
+def now_ms() -> int:
+    if hasattr(time, "time_ns"):
+        return time.time_ns() // 1000000
+    return int(time.time() * 1000)
+
+
+def encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos: int) -> tuple:
+    """@return (Wert, nächste Position)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _encode_text(text: str, out: bytearray) -> None:
+    data = text.encode("utf-8")
+    encode_varint(len(data), out)
+    out.extend(data)
+
+
+def _encode_arg(arg, out: bytearray) -> None:
+    if arg is None:
+        out.append(ARG_NONE)
+    elif arg is True:
+        out.append(ARG_TRUE)
+    elif arg is False:
+        out.append(ARG_FALSE)
+    elif isinstance(arg, int):
+        out.append(ARG_INT)
+        encode_varint(zigzag(arg), out)
+    elif isinstance(arg, float):
+        out.append(ARG_FLOAT)
+        out.extend(struct.pack("<f", arg))
+    else:
+        out.append(ARG_STR)
+        _encode_text(str(arg), out)
+
+
+class BinaryRingLogHandler(logging.Handler):
+    """Schreibt Log-Einträge kompakt in eine vorab angelegte Ringdatei fester Größe.
+
+    Statt "Zeit - Level - Text" als Klartext landen Zeitabstand, Level-Byte,
+    die ID des Format-Templates (`record.msg`) und die Argumente im Flash. Die
+    Datei wird nie rotiert: neue Einträge überschreiben die ältesten an Ort und
+    Stelle. Einträge werden wie beim `BufferedRotatingFileHandler` im RAM
+    gesammelt und bei `buffer_bytes`, ab `flush_level` oder durch `flush_loop()`
+    geschrieben. Lesbar macht die Datei `tools/decode_binary_log.py`.
+
+    Templates gibt es nur für Aufrufe mit %-Argumenten (`logger.info("x=%d", x)`);
+    fertig formatierte Texte werden direkt gespeichert.
+    """
+
+    def __init__(self, filename="logfile.alog", ring_bytes=64 * 1024, buffer_bytes=1024,
+                 flush_level=logging.ERROR, flush_interval_ms=1000, max_templates=256):
+        super().__init__()
+        self.filename = filename
+        self.ring_bytes = ring_bytes
+        self.buffer_bytes = buffer_bytes
+        self.flush_level = flush_level
+        self.flush_interval_ms = flush_interval_ms
+        self.max_templates = max_templates
+        self._template_file = filename + ".tpl"
+        self._templates = {}  # Template -> ID
+        self._buffer = []
+        self._buffered = 0
+        self._last_ms = 0
+        self._lock = _thread.allocate_lock()
+        self._file = self._open()
+
+    def handle(self, record):
+        self.emit(record)
+
+    def _open(self):
+        try:
+            f = open(self.filename, "r+b")
+            header = f.read(HEADER_SIZE)
+            if len(header) == HEADER_SIZE:
+                magic, version, _, _, size, head, tail, last_ms, count = struct.unpack(HEADER_FORMAT, header)
+                if magic == MAGIC and version == VERSION and size == self.ring_bytes:
+                    self._head, self._tail, self._last_ms, self._count = head, tail, last_ms, count
+                    self._load_templates()
+                    return f
+            f.close()
+        except OSError:
+            pass
+        return self._create()
+
+    def _create(self):
+        """Legt die Ringdatei in voller Größe an, damit später nie Blöcke nachbelegt werden müssen."""
+        self._head = self._tail = self._count = 0
+        with open(self.filename, "wb") as f:
+            f.write(bytes(HEADER_SIZE))
+            block = bytes(512)
+            remaining = self.ring_bytes
+            while remaining > 0:
+                f.write(block if remaining >= len(block) else block[:remaining])
+                remaining -= len(block)
+        try:
+            os.remove(self._template_file)
+        except OSError:
+            pass
+        f = open(self.filename, "r+b")
+        self._write_header(f)
+        return f
+
+    def _load_templates(self):
+        try:
+            with open(self._template_file, "r") as f:
+                for line in f:
+                    template_id, template = json.loads(line)
+                    self._templates[template] = template_id
+        except (OSError, ValueError):
+            pass
+
+    def _template_id(self, template: str) -> int:
+        template_id = self._templates.get(template)
+        if template_id is not None or len(self._templates) >= self.max_templates:
+            return template_id
+        template_id = len(self._templates) + 1
+        try:
+            with open(self._template_file, "a") as f:
+                f.write(json.dumps([template_id, template]) + "\n")
+        except OSError:
+            return None
+        self._templates[template] = template_id
+        return template_id
+
+    def encode(self, record, timestamp: int) -> bytes:
+        """Kodiert einen Eintrag ohne Längenfeld, mit `timestamp` (ms) relativ zum zuletzt gespeicherten Eintrag."""
+        out = bytearray()
+        out.append(record.levelno)
+        encode_varint(zigzag(timestamp - self._last_ms if self._last_ms else 0), out)
+        args = getattr(record, "args", None)  # fehlt bei Loggern außerhalb von `alvik_logger.logger` unter MicroPython
+        template_id = None
+        if args and isinstance(args, tuple) and isinstance(record.msg, str):
+            template_id = self._template_id(record.msg)
+        if template_id is None:
+            encode_varint(INLINE_TEXT, out)
+            _encode_text(record.getMessage() if hasattr(record, "getMessage") else record.message, out)
+        else:
+            encode_varint(template_id, out)
+            for arg in args:
+                _encode_arg(arg, out)
+        return out
+
+    def emit(self, record):
+        try:
+            with self._lock:
+                timestamp = now_ms()
+                data = self.encode(record, timestamp)
+                if len(data) + 2 > min(_MAX_RECORD, self.ring_bytes // 4):
+                    return  # einzelne Riesen-Einträge würden einen großen Teil des Rings verdrängen
+                self._last_ms = timestamp  # erst jetzt, der nächste Zeitabstand bezieht sich auf diesen Eintrag
+                self._buffer.append(data)
+                self._buffered += len(data) + 2
+                full = self._buffered >= self.buffer_bytes
+        except Exception as e:
+            print(f"[ERROR] BinaryRingLogHandler konnte nicht kodieren: {e}")
+            return
+        if full or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self):
+        """Schreibt gepufferte Einträge an die Schreibposition und aktualisiert den Header."""
+        with self._lock:
+            if not self._buffer or self._file is None:
+                return
+            records = self._buffer
+            self._buffer = []
+            self._buffered = 0
+            try:
+                for data in records:
+                    self._append(data)
+                self._write_header(self._file)
+                self._file.flush()
+            except OSError as e:
+                print(f"[ERROR] BinaryRingLogHandler konnte nicht schreiben: {e}")
+
+    def _append(self, data: bytes) -> None:
+        f = self._file
+        length = len(data) + 2
+        if self._head + length > self.ring_bytes:
+            self._evict_until(self.ring_bytes)
+            if self.ring_bytes - self._head >= 2:
+                f.seek(HEADER_SIZE + self._head)
+                f.write(struct.pack("<H", WRAP_MARKER))
+            self._head = 0
+        self._evict_until(self._head + length)
+        f.seek(HEADER_SIZE + self._head)
+        f.write(struct.pack("<H", length))
+        f.write(data)
+        self._head += length
+        self._count += 1
+
+    def _evict_until(self, limit: int) -> None:
+        """Verwirft die ältesten Einträge, solange sie in [head, limit) beginnen."""
+        f = self._file
+        while self._count and self._head <= self._tail < limit:
+            f.seek(HEADER_SIZE + self._tail)
+            length = struct.unpack("<H", f.read(2))[0]
+            if length == WRAP_MARKER:
+                self._tail = 0
+                continue
+            self._tail += length
+            self._count -= 1
+            if self.ring_bytes - self._tail < 2:
+                self._tail = 0  # kein Platz für eine Länge mehr, der nächste Eintrag steht am Anfang
+        if not self._count:
+            self._tail = self._head
+
+    def _write_header(self, f) -> None:
+        f.seek(0)
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, time.gmtime(0)[0], 0, self.ring_bytes,
+                            self._head, self._tail, self._last_ms, self._count))
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        super().close()
+
+    async def flush_loop(self):
+        """Schreibt den Puffer regelmäßig, damit auch seltene Einträge zeitnah im Flash landen."""
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            if self._buffer:
+                self.flush()
@@ -1,5 +1,11 @@
 import os
+import time
+import _thread
 import logging
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 class RotatingFileHandler(logging.Handler):
     """Einfacher Rotating File Handler für MicroPython mit Backup-Count & Encoding."""
@@ -70,6 +76,166 @@ class RotatingFileHandler(logging.Handler):
             return 0
 
 
+def _timestamp() -> str:
+    """Aktuelle Zeit als "Sekunden.Millisekunden", ohne Umweg über float (auf dem ESP32 nur einfach genau)."""
+    try:
+        ms = time.time_ns() // 1000000
+    except AttributeError:
+        ms = int(time.time() * 1000)
+    return "%d.%03d" % (ms // 1000, ms % 1000)
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """Sammelt Log-Einträge im RAM und schreibt sie blockweise in die Datei.
+
+    Die Dateigröße wird nur beim Anlegen einmal per `os.stat()` gelesen und danach
+    im Speicher mitgezählt. Geschrieben wird, sobald `buffer_bytes` erreicht sind,
+    bei Einträgen ab `flush_level` sofort und ansonsten spätestens nach
+    `flush_interval_ms` durch `flush_loop()`, die als Task auf der Event-Loop laufen
+    muss. Bis zum nächsten Flush gehen Einträge bei einem Absturz verloren.
+
+    Für Abfragen ohne Lesen der ganzen Datei führt der Handler einen dünnen Index
+    (`index`: Eintragsnummer, Byte-Offset, Zeit für jeden `index_every`-ten
+    Eintrag), der in `<datei>.idx` mitgeschrieben und beim Rotieren verworfen wird.
+    Ist `live` eine Liste, landen neue Einträge zusätzlich dort (Live-Tail).
+
+    Jeder Eintrag beginnt mit einem eigenen Präfix "[Sekunden.Millisekunden] ".
+    Darüber findet `UPYLogReader` Eintragsanfänge und Zeiten unabhängig vom
+    Formatter; `%(asctime)s` ist unter MicroPython ohne `time.strftime` nur "None".
+    """
+
+    def __init__(self, filename="log.txt", maxBytes=5000, backupCount=3, encoding="utf-8",
+                 buffer_bytes=2048, flush_level=logging.ERROR, flush_interval_ms=1000, index_every=32):
+        super().__init__(filename, maxBytes, backupCount, encoding)
+        self.buffer_bytes = buffer_bytes
+        self.flush_level = flush_level
+        self.flush_interval_ms = flush_interval_ms
+        self.index_every = index_every
+        self._buffer = []  # (Text, Zeitstempel)
+        self._buffered = 0  # Zeichen im Puffer
+        self._size = self.get_file_size(filename)
+        self._buffer_lock = _thread.allocate_lock()  # Skript-Threads loggen ebenfalls
+        self._flush_lock = _thread.allocate_lock()  # hält die Reihenfolge paralleler Flushes, ohne `emit()` zu blockieren
+        self._index_file = filename + ".idx"
+        self.index = []
+        self.records = 0  # Einträge in der aktuellen Datei (ohne Index nur ab Start gezählt)
+        self.live = None
+        self._load_index()
+
+    @property
+    def size(self) -> int:
+        """Geschriebene Bytes der aktuellen Datei, ohne Puffer."""
+        return self._size
+
+    def _load_index(self):
+        try:
+            with open(self._index_file, "r") as f:
+                for line in f:
+                    record_no, offset, created = line.split()
+                    if int(offset) >= self._size:
+                        break  # Index gehört zu einer älteren Datei
+                    self.index.append((int(record_no), int(offset), float(created)))
+        except (OSError, ValueError):
+            pass
+        if self.index:
+            self.records = self.index[-1][0] + 1  # Einträge nach dem letzten Indexpunkt sind unbekannt
+        else:
+            self._reset_index()  # vorhandener Inhalt ohne Index ist nur ab Offset 0 erreichbar
+
+    def _reset_index(self):
+        self.index = []
+        self.records = 0
+        try:
+            os.remove(self._index_file)
+        except OSError:
+            pass
+
+    def emit(self, record):
+        """Hängt den Eintrag an den Puffer an; schreibt nur, wenn der Puffer voll ist oder der Level es verlangt."""
+        try:
+            stamp = _timestamp()
+            log_entry = "[" + stamp + "] " + self.format(record) + "\n"
+        except Exception as e:
+            print(f"[ERROR] BufferedRotatingFileHandler konnte nicht formatieren: {e}")
+            return
+        with self._buffer_lock:
+            self._buffer.append((log_entry, stamp))
+            self._buffered += len(log_entry)
+            full = self._buffered >= self.buffer_bytes
+            if self.live is not None:
+                self.live.append(log_entry)
+        if full or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self):
+        """Schreibt den Puffer mit einem einzigen `write()` in die Datei.
+
+        `_buffer_lock` wird nur zum Austauschen des Puffers gehalten. Loggende
+        Threads warten nur dann auf den Flash, wenn ihr Eintrag selbst den Flush auslöst.
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                if not self._buffer:
+                    return
+                entries = self._buffer
+                self._buffer = []
+                self._buffered = 0
+            try:
+                parts = [entry.encode(self.encoding) for entry, _ in entries]
+                length = sum(len(part) for part in parts)
+                if self._size and self._size + length > self.max_bytes:
+                    self.rotate_files()
+                    self._size = 0
+                    self._reset_index()
+                with open(self.filename, "ab") as log_file:
+                    log_file.write(b"".join(parts))
+                self._extend_index(entries, parts)
+                self._size += length
+            except Exception as e:
+                print(f"[ERROR] BufferedRotatingFileHandler konnte nicht schreiben: {e}")
+
+    def _extend_index(self, entries, parts):
+        offset = self._size
+        added = []
+        for (_, stamp), part in zip(entries, parts):
+            if self.records % self.index_every == 0:
+                added.append((self.records, offset, stamp))
+            self.records += 1
+            offset += len(part)
+        if added:
+            self.index.extend((record_no, offset, float(stamp)) for record_no, offset, stamp in added)
+            with open(self._index_file, "a") as f:
+                f.write("".join(f"{record_no} {offset} {stamp}\n" for record_no, offset, stamp in added))
+
+    def take_live(self) -> list:
+        """Liefert die seit dem letzten Aufruf neuen Einträge für den Live-Tail."""
+        with self._buffer_lock:
+            entries = self.live or []
+            if self.live is not None:
+                self.live = []
+        return entries
+
+    def rotate_files(self):
+        """Ohne Backups wird die Datei einfach neu begonnen."""
+        if self.backup_count > 0:
+            super().rotate_files()
+            return
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    async def flush_loop(self):
+        """Schreibt den Puffer regelmäßig, damit auch seltene Einträge zeitnah in der Datei landen."""
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            self.flush()
+
+
 if __name__ == "__main__":
     # Logger einrichten
     logger = logging.getLogger("esp32")
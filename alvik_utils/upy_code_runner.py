@@ -1,47 +1,140 @@
+import os
 import sys
+import time
 import _thread
+import logging
 from collections import deque
-from alvik_logger.logger import logger
+from alvik_logger.logger import get_logger, get_sampler
+from alvik_utils.upy_compile_cache import UPYCompileCache, UPYCompiledScript, compile_script
+from alvik_utils.upy_output_hub import UPYOutputHub
+from alvik_utils.upy_output_router import UPYOutputRoute
+from alvik_utils.upy_run_stats import UPYRunStats, RUN_ABANDONED, RUN_ERROR, RUN_FINISHED, RUN_STOPPED
 from alvik_utils.upy_streamwriter import UPYStreamWriter
-from alvik_utils.utils import get_error_message
+from alvik_utils.upy_threadsafe_flag import UPYThreadSafeFlag
+from alvik_utils.utils import get_error_message, ticks_add, ticks_diff, ticks_ms
 try:
     import uasyncio as asyncio
 except ImportError:
     import asyncio
-import builtins
+try:
+    import ctypes  # nur CPython: Exception in einen fremden Thread werfen
+except ImportError:
+    ctypes = None
+
+logger = get_logger("runner")
+_output_sampler = get_sampler("runner.output")  # Skript-Ausgabe im Log
+
+STOP_NOT_RUNNING = "not running"
+STOP_STOPPED = "stopped"
+STOP_ABANDONED = "abandoned"  # Thread hat die Frist überschritten und läuft unbeobachtet weiter
+
+
+class ScriptStopped(BaseException):
+    """Wird im Skript ausgelöst, um es zu beenden. Erbt von BaseException, damit
+    ein `except Exception` im Skript den Stopp nicht verschluckt."""
+
 
 class MockSys:
+    """Ersatz für das Modul `sys` im Skript: `stdout`/`stderr` zeigen auf die Ausgabe des Laufs."""
+
     def __init__(self, stream):
         self._real_sys = sys
-        self._real_print = builtins.print
         self.stdout = stream
         self.stderr = stream
         self.stream = stream
-        self.version = self._real_sys.version
-
-    def patch_sys(self):
-        sys.modules['sys'] = self
-        builtins.print = self.stream.print
 
-    def undo_patch_sys(self):
-        sys.modules['sys'] = self._real_sys
-        builtins.print = self._real_print
+    def __getattr__(self, name):
+        return getattr(self._real_sys, name)
 
     def print_exception(self, exc, file=None):
         # Fallback auf echte Implementation, aber mit umgeleitetem Output
-        self._real_sys.print_exception(exc, file)
+        self._real_sys.print_exception(exc, file or self.stream)
 
     def exit(self, retval = 0) -> None:
         self._real_sys.exit(retval)
 
 
+class _StoppableTime:
+    """Ersatz für das Modul `time` im Skript-Thread.
+
+    `sleep()` und `sleep_ms()` schlafen in kurzen Abschnitten und prüfen dazwischen,
+    ob das Skript gestoppt werden soll. Alles andere wird an `time` durchgereicht.
+    """
+    _SLICE_MS = 20
+
+    def __init__(self, check_stop):
+        self._time = time
+        self._check_stop = check_stop
+
+    def __getattr__(self, name):
+        return getattr(self._time, name)
+
+    def sleep(self, seconds) -> None:
+        self.sleep_ms(int(seconds * 1000))
+
+    def sleep_ms(self, ms: int) -> None:
+        while True:
+            self._check_stop()
+            if ms <= 0:
+                return
+            step = ms if ms < self._SLICE_MS else self._SLICE_MS
+            self._time.sleep(step / 1000)
+            ms -= step
+
+
+
+OVERFLOW_DROP = "drop"  # älteste Zeilen verwerfen und zählen
+OVERFLOW_BLOCK = "block"  # Skript-Thread bremsen, bis wieder Platz ist
+OVERFLOW_SPILL = "spill"  # Überhang in eine Datei im Flash auslagern
+
+_LINE_OVERHEAD = 16  # geschätzter Speicherbedarf einer Zeile zusätzlich zu ihrem Text
+
 
 class LiveStream:
-    _exit_msg = "__EXIT__LIVESTREAM__"
-    """Ersetzt `print()`, um Ausgabe live an den Client zu senden."""
-    def __init__(self, writer: UPYStreamWriter):
-        self._writer: UPYStreamWriter = writer
-        self._msg_queue = deque((), 100)
+    """Ersetzt `print()`, um Ausgabe live an die Clients zu senden.
+
+    Die Ausgabe wird blockweise (höchstens `max_batch_bytes`) an einen
+    `UPYOutputHub` übergeben, der sie an alle Abonnenten verteilt. Kommt während
+    der Übergabe schon neue Ausgabe an, wird vor dem nächsten Block
+    `flush_window_ms` gewartet, damit sich bei gesprächigen Skripten größere
+    Blöcke bilden. Vereinzelte Ausgaben gehen weiterhin sofort raus.
+
+    Die Warteschlange ist auf `max_queue_bytes` begrenzt. Was bei vollem Puffer
+    passiert, legt `overflow` fest (`OVERFLOW_DROP`, `OVERFLOW_BLOCK` oder
+    `OVERFLOW_SPILL`). Verworfene Zeilen werden gezählt (`dropped`) und dem Client
+    als `[N lines dropped]` gemeldet. Bei `OVERFLOW_BLOCK` und `OVERFLOW_SPILL`
+    wartet die Übergabe zusätzlich auf langsame Abonnenten (`UPYOutputHub.drain()`).
+    """
+    def __init__(self, hub: UPYOutputHub, max_batch_bytes: int = 1024, flush_window_ms: int = 5,
+                 log_output: bool = True, max_queue_bytes: int = 4096, overflow: str = OVERFLOW_DROP,
+                 spill_file: str = "live_output.spill", max_spill_bytes: int = 256 * 1024):
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK, OVERFLOW_SPILL):
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        self._hub = hub
+        self._msg_queue = deque((), max_queue_bytes // _LINE_OVERHEAD + 1)  # Bytegrenze greift vor maxlen
+        self._queued_bytes = 0
+        self._lock = _thread.allocate_lock()  # Skript-Thread schreibt, Event-Loop liest
+        self._loop_thread = _thread.get_ident()  # aus der Event-Loop darf write() nie blockieren
+        self._data_available = UPYThreadSafeFlag()  # weckt stream_writer_loop, sobald Ausgabe anliegt
+        self._space = _thread.allocate_lock()  # OVERFLOW_BLOCK: gesperrt, bis stream_writer_loop Platz meldet
+        self._space.acquire()
+        self._unblocked = False
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_window_ms = flush_window_ms
+        self.log_output = log_output  # Ausgabe zusätzlich (blockweise, DEBUG, Sampler "runner.output") ins Log schreiben
+        self.max_queue_bytes = max_queue_bytes
+        self.overflow = overflow
+        self.dropped = 0  # insgesamt verworfene Zeilen
+        self.lines_written = 0
+        self.bytes_written = 0
+        self._dropped_unreported = 0
+        self._spill_file = spill_file
+        self.max_spill_bytes = max_spill_bytes
+        self._spill = None
+        self._spill_read_pos = 0
+        self._spill_write_pos = 0
+        self._closed = False
+        self._consumer_done = False
 
     async def awrite(self, text: str) -> None:
         """Sendet jeden `print()`-Aufruf sofort weiter."""
@@ -54,27 +147,132 @@ class LiveStream:
                 text = text.decode("utf-8")
             except UnicodeDecodeError:
                 text = repr(text)
-        self._msg_queue.append(text)
+        cost = len(text) + _LINE_OVERHEAD
+        if self.overflow == OVERFLOW_BLOCK and _thread.get_ident() != self._loop_thread:
+            # Skript-Thread warten lassen, bis der Client aufgeholt hat
+            while (self._queued_bytes and self._queued_bytes + cost > self.max_queue_bytes
+                   and not self._consumer_done and not self._unblocked):
+                self._space.acquire()  # schläft ohne Polling bis `_signal_space()`
+        with self._lock:
+            self.lines_written += 1
+            self.bytes_written += len(text)
+            if self._consumer_done:
+                return  # Ausgabe ist bereits abgeschlossen
+            if self._spill_write_pos > self._spill_read_pos or (
+                    self.overflow == OVERFLOW_SPILL and self._queued_bytes + cost > self.max_queue_bytes):
+                self._spill_line(text)  # solange die Datei nicht geleert ist, dorthin (Reihenfolge)
+            else:
+                if self.overflow == OVERFLOW_DROP:
+                    while self._msg_queue and self._queued_bytes + cost > self.max_queue_bytes:
+                        self._queued_bytes -= len(self._msg_queue.popleft()) + _LINE_OVERHEAD
+                        self._count_dropped(1)
+                self._msg_queue.append(text)
+                self._queued_bytes += cost
+        self._data_available.set()
+
+    def _signal_space(self) -> None:
+        """Weckt einen in `write()` wartenden Skript-Thread. Nur aus der Event-Loop aufrufen."""
+        if self._space.locked():
+            self._space.release()
+
+    def unblock(self) -> None:
+        """Lässt `write()` nicht mehr warten, z. B. damit ein gestopptes Skript enden kann."""
+        self._unblocked = True
+        self._signal_space()
+
+    def _count_dropped(self, lines: int) -> None:
+        self.dropped += lines
+        self._dropped_unreported += lines
+
+    def _spill_line(self, text: str) -> None:
+        data = text.encode("utf-8")
+        if self._spill_write_pos + len(data) + 8 > self.max_spill_bytes:
+            self._count_dropped(1)
+            return
+        try:
+            if self._spill is None:
+                self._spill = open(self._spill_file, "w+b")
+            self._spill.seek(self._spill_write_pos)
+            self._spill.write(str(len(data)).encode() + b"\n")
+            self._spill.write(data)
+            self._spill_write_pos = self._spill.tell()
+        except OSError:
+            self._count_dropped(1)  # Flash voll oder nicht beschreibbar
+
+    def _read_spilled(self, batch: list, size: int) -> int:
+        """Liest ausgelagerte Zeilen zurück. Muss unter `self._lock` aufgerufen werden."""
+        self._spill.seek(self._spill_read_pos)
+        while self._spill_read_pos < self._spill_write_pos and size < self.max_batch_bytes:
+            length = int(self._spill.readline())
+            batch.append(self._spill.read(length).decode("utf-8"))
+            size += length + _LINE_OVERHEAD
+            self._spill_read_pos = self._spill.tell()
+        if self._spill_read_pos >= self._spill_write_pos:
+            self._spill_read_pos = self._spill_write_pos = 0  # Datei von vorn wiederverwenden
+        return size
+
+    def _close_spill(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            try:
+                os.remove(self._spill_file)
+            except OSError:
+                pass
+
+    def _pending(self) -> bool:
+        return bool(self._msg_queue) or self._spill_write_pos > self._spill_read_pos
+
+    def _take_batch(self) -> list:
+        """Entnimmt Zeilen bis `max_batch_bytes`, zuerst aus dem Speicher, dann aus der Datei."""
+        batch = []
+        size = 0
+        with self._lock:
+            if self._dropped_unreported:
+                batch.append(f"[{self._dropped_unreported} lines dropped]")
+                logger.warning("Script output: %d lines dropped", self._dropped_unreported)
+                self._dropped_unreported = 0
+            while self._msg_queue and size < self.max_batch_bytes:
+                text = self._msg_queue.popleft()
+                cost = len(text) + _LINE_OVERHEAD
+                self._queued_bytes -= cost
+                size += cost
+                batch.append(text)
+            if size < self.max_batch_bytes and self._spill_write_pos > self._spill_read_pos:
+                self._read_spilled(batch, size)
+        return batch
+
     async def stream_writer_loop(self) -> None:
-        exit = False
-        while not exit:
-            while self._msg_queue:
-                try:
-                    text = self._msg_queue.popleft()
-                    if text == self._exit_msg:
-                        exit = True
+        backlog = False
+        try:
+            while True:
+                closed = self._closed  # vor dem Leeren lesen, damit keine letzte Ausgabe verloren geht
+                if not self._pending() and not self._dropped_unreported:
+                    if closed:
                         break
-                    logger.info(text)
-                    output = text.strip().replace("\n", "<br>")  # HTML-taugliche Zeilenumbrüche
-                    await self._writer.awrite(f"data: {output}\n\n".encode("utf-8"))
-                except ConnectionResetError:
-                    logger.warning("Client hat die Verbindung getrennt.")
-                    exit = True
-                    break
-            await asyncio.sleep(0.1)
-        logger.info(f"Execution completed.")
-        await self._writer.send_response(200)
-        await self._writer.aclose()
+                    await self._data_available.wait()  # schläft ohne Polling, bis write() Daten meldet
+                elif not backlog and not closed and self.flush_window_ms:
+                    await asyncio.sleep(self.flush_window_ms / 1000)  # Skript gibt laufend aus -> sammeln
+                batch = self._take_batch()
+                self._signal_space()
+                backlog = self._pending()  # Block war voll, Rest ohne Wartezeit senden
+                if not batch:
+                    continue
+                if self.log_output and logger.isEnabledFor(logging.DEBUG) and _output_sampler.sample():
+                    logger.debug("Script output:\n%s", "\n".join(batch))
+                self._hub.publish(batch)
+                if self.overflow != OVERFLOW_DROP:
+                    await self._hub.drain()  # Gegendruck bis in den Skript-Thread weitergeben
+        finally:
+            with self._lock:
+                self._consumer_done = True
+                self._msg_queue = deque((), 1)
+                self._queued_bytes = 0
+                self._spill_read_pos = self._spill_write_pos = 0
+                self._close_spill()
+            self._signal_space()
+            self._hub.finish()
+        logger.info("Execution completed.")
 
     def print(self, *args) -> None:
         self.write(" ".join(map(str, args)))
@@ -84,59 +282,252 @@ class LiveStream:
         pass
 
     def close(self) -> None:
-        self._msg_queue.append(self._exit_msg)
+        self._closed = True
+        self._data_available.set()
 
 
 class UPYCodeRunner:
-    def __init__(self, filename: str, writer: UPYStreamWriter):
-        self._stream = LiveStream(writer)
+    """Führt eine Python-Datei aus und verteilt ihre Ausgabe.
+
+    Definiert das Skript `async def main()`, läuft `main()` als Task auf der
+    Event-Loop des Servers, und `stop()` bricht den Task sofort ab. Alle anderen Skripte laufen
+    blockierend in einem eigenen Thread. Dort löst `stop()` beim nächsten
+    `print()` oder `time.sleep()` ein `ScriptStopped` aus, unter CPython zusätzlich
+    sofort per `PyThreadState_SetAsyncExc`.
+
+    `print`, `sys` und `time` werden nur für das Skript ersetzt (`UPYOutputRoute`),
+    mehrere Runner stören sich also nicht gegenseitig.
+
+    Die Ausgabe läuft über `output` (`UPYOutputHub`); weitere Clients können sich
+    mit `subscribe()` jederzeit anhängen, auch nach Ende des Skripts, solange die
+    letzten `replay_bytes` Ausgabe im Ring liegen. Mit `compile_cache` wird die
+    Datei nur kompiliert, wenn sie sich seit dem letzten Lauf geändert hat.
+
+    Laufzeit, Heap-Höchststand, Ausgabe und Ergebnis landen in `stats`
+    (`UPYRunStats`), abgetastet alle `sample_interval_ms`.
+    """
+    def __init__(self, filename: str, writer: UPYStreamWriter = None, overflow: str = OVERFLOW_DROP,
+                 max_queue_bytes: int = 4096, replay_bytes: int = 4096, compile_cache: UPYCompileCache = None,
+                 sample_interval_ms: int = 100):
+        self.stats = UPYRunStats(filename)
+        self.sample_interval_ms = sample_interval_ms
+        self._compile_cache = compile_cache
+        self.output = UPYOutputHub(replay_bytes)
+        self._stream = LiveStream(self.output, max_queue_bytes=max_queue_bytes, overflow=overflow)
+        self._writer = writer
         self._filename = filename
         self._should_stop = False
         self._is_running = False
+        self._task = None  # Task von `main()` bei Skripten mit `async def main()`
+        self._sample_task = None  # Task von `_sample_loop()`
+        self._background = []  # weitere Tasks des Laufs, nur als Referenz gegen vorzeitiges Einsammeln
+        self._thread_id = None  # gesetzt, solange `exec` im Skript-Thread läuft
+        self._thread_lock = _thread.allocate_lock()  # schützt `_thread_id` gegen `stop()`
+        self._finished = None  # UPYThreadSafeFlag, wird gesetzt, wenn der Skript-Thread endet
+        self._done = asyncio.Event()  # Lauf ist beendet (auch durch Fehler oder Aufgeben)
+        self.stop_status = None
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def is_running(self) -> bool:
+        return self._is_running
+
+    @property
+    def is_async(self) -> bool:
+        return self._task is not None
+
+    def subscribe(self, writer, last_seq: int = 0) -> None:
+        """Sendet die Ausgabe ab Sequenznummer `last_seq + 1` zusätzlich an `writer`."""
+        self.output.attach(writer, last_seq)
 
     def stop(self):
-        if self._is_running:
-            self._is_running = False
+        if self._is_running and not self._should_stop:
             self._stream.write(f"Stopping execution of {self._filename}")
             self._should_stop = True
+            self._stream.unblock()
+            if self._task is not None:
+                self._task.cancel()
+            elif ctypes is not None:
+                with self._thread_lock:
+                    if self._thread_id is not None:
+                        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id),
+                                                                   ctypes.py_object(ScriptStopped))
 
     def _stopped(self):
         self._should_stop = False
         self._is_running = False
 
-    async def stop_and_wait(self):
+    async def stop_and_wait(self, timeout: float = 2) -> str:
+        """Stoppt das Skript und wartet höchstens `timeout` Sekunden auf sein Ende.
+
+        Endet ein Skript-Thread nicht rechtzeitig, wird er aufgegeben: seine Ausgabe
+        wird abgeschlossen, damit das nächste Skript starten kann.
+
+        @return STOP_NOT_RUNNING, STOP_STOPPED oder STOP_ABANDONED
+        """
+        if not self._is_running:
+            return STOP_NOT_RUNNING
         self.stop()
-        while self._should_stop:
-            self._stream.write(f"Waiting execution of file {self._filename} to be stopped")
-            await asyncio.sleep(1)
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+            self.stop_status = STOP_STOPPED
+        except asyncio.TimeoutError:
+            self.stop_status = STOP_ABANDONED
+            self._finish_stats(RUN_ABANDONED)
+            logger.error("%s did not stop within %s s, abandoning it.", self._filename, timeout)
+            self._stream.write(f"ERROR:{self._filename} did not stop within {timeout} s and was abandoned.")
+            if self._task is not None:
+                self._task.cancel()
+            self._stopped()
+            self._stream.close()
+            self._set_done()
+        return self.stop_status
+
+    async def wait_done(self) -> None:
+        """Wartet, bis der Lauf beendet ist."""
+        await self._done.wait()
+
+    def _set_done(self) -> None:
+        if self._sample_task is not None:
+            self._sample_task.cancel()
+            self._sample_task = None
+        self._done.set()
+
+    async def _wait_thread(self) -> None:
+        await self._finished.wait()
+        self._set_done()
 
     def _should_stop_signal(self):
         return self._should_stop
 
-    def _run_code(self, code: str) -> None:
-        mock_sys = MockSys(self._stream)
-        mock_sys.patch_sys()
+    def _check_stop(self) -> None:
+        """Löst im Skript-Thread `ScriptStopped` aus, sobald `stop()` aufgerufen wurde."""
+        if self._should_stop and _thread.get_ident() == self._thread_id:
+            raise ScriptStopped()
+
+    def _print(self, *args) -> None:
+        self._check_stop()
+        self._stream.print(*args)
 
-        namespace = {
-            "print": self._stream.print,
-            "sys" : MockSys(self._stream),
+    def _load_script(self) -> UPYCompiledScript:
+        if self._compile_cache is not None:
+            return self._compile_cache.get(self._filename)
+        return compile_script(self._filename)
+
+    def _route(self, threaded: bool) -> UPYOutputRoute:
+        """Im Thread prüfen `print()` und `time.sleep()` zusätzlich auf `stop()`."""
+        modules = {"sys": MockSys(self._stream)}
+        if threaded:
+            modules["time"] = _StoppableTime(self._check_stop)
+        return UPYOutputRoute(self._print if threaded else self._stream.print, modules)
+
+    def _namespace(self, route: UPYOutputRoute) -> dict:
+        return route.namespace({
+            "sys": route.modules["sys"],
             "_should_stop_signal": self._should_stop_signal
-        }
+        })
+
+    def _finish_stats(self, status: str, error: str = None) -> None:
+        stream = self._stream
+        self.stats.lines, self.stats.bytes, self.stats.dropped = stream.lines_written, stream.bytes_written, stream.dropped
+        self.stats.finish(status, error)
+
+    async def _sample_loop(self) -> None:
+        """Tastet den Heap ab und misst, wie verspätet die Event-Loop den Sampler weckt."""
+        interval = self.sample_interval_ms
+        while self._is_running:
+            expected = ticks_add(ticks_ms(), interval)
+            await asyncio.sleep(interval / 1000)
+            self.stats.sample(max(0, ticks_diff(ticks_ms(), expected)))
+
+    def _report_error(self, e: Exception) -> None:
+        error_trace = get_error_message(e)
+        self._stream.write(f"ERROR:Execution of {self._filename} failed with {e}.\n{error_trace}")  # Fehler auch sofort senden
+        self._finish_stats(RUN_ERROR, f"{type(e).__name__}: {e}")
+
+    def _run_code(self, code) -> None:
+        route = self._route(True)
+        route.bind()
+        self.stats.begin("thread")
         try:
-            exec(code, namespace)  # Code mit modifizierter `print()`-Funktion ausführen
+            try:
+                with self._thread_lock:
+                    self._thread_id = _thread.get_ident()
+                exec(code, self._namespace(route))  # Code mit modifizierter `print()`-Funktion ausführen
+            finally:
+                self._leave_script()
+            self._finish_stats(RUN_FINISHED)
+        except SystemExit:
+            self._finish_stats(RUN_FINISHED)
+        except ScriptStopped:
+            self._finish_stats(RUN_STOPPED)  # durch stop() beendet
         except Exception as e:
-            error_trace = get_error_message(e)
-            self._stream.write(f"ERROR:Execution of {self._filename} failed with {e}.\n{error_trace}")  # Fehler auch sofort senden
+            self._report_error(e)
+        finally:
+            route.unbind()
+            if self.stop_status != STOP_ABANDONED:
+                self._stopped()
+                self._stream.close()
+            self._finished.set()
+
+    def _leave_script(self) -> None:
+        """Beendet die Zustellung von `ScriptStopped` an den Skript-Thread.
+
+        Ein von `stop()` kurz vor dem Ende von `exec` geworfenes, noch nicht
+        zugestelltes `ScriptStopped` wird verworfen, sonst träfe es das Aufräumen.
+        """
+        with self._thread_lock:
+            thread_id = self._thread_id
+            self._thread_id = None
+            if ctypes is not None and self._should_stop and thread_id is not None:
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), None)
+
+    async def _run_main(self, main) -> None:
+        try:
+            await main()
+            self._finish_stats(RUN_FINISHED)
+        except SystemExit:
+            self._finish_stats(RUN_FINISHED)
+        except asyncio.CancelledError:
+            self._finish_stats(RUN_STOPPED)  # durch stop() abgebrochen
+        except Exception as e:
+            self._report_error(e)
         finally:
-            mock_sys.undo_patch_sys()
             self._stopped()
             self._stream.close()
+            self._set_done()
 
     async def run_file(self) -> None:
         """Startet eine Python-Datei und sendet deren Output in Echtzeit zurück."""
-        with open(self._filename, "r") as f:
-            code = f.read()
         await self._stream.awrite(f"Running file {self._filename}")
-        asyncio.create_task(self._stream.stream_writer_loop())
+        self._background.append(asyncio.create_task(self._stream.stream_writer_loop()))
+        if self._writer is not None:
+            self.subscribe(self._writer)
+        try:
+            script = self._load_script()
+            if script.async_main:
+                self.stats.begin("async")
+                route = self._route(False)
+                namespace = self._namespace(route)
+                route.bind()
+                try:
+                    exec(script.code, namespace)  # definiert nur `main()`, läuft auf der Event-Loop
+                finally:
+                    route.unbind()
+                main = namespace["main"]
+        except Exception as e:
+            self._report_error(e)
+            self._stream.close()
+            self._set_done()
+            return
         self._is_running = True
-        _thread.start_new_thread(self._run_code, (code, ))
+        self._sample_task = asyncio.create_task(self._sample_loop())
+        if script.async_main:
+            self._task = asyncio.create_task(self._run_main(main))
+        else:
+            self._finished = UPYThreadSafeFlag()
+            self._background.append(asyncio.create_task(self._wait_thread()))
+            _thread.start_new_thread(self._run_code, (script.code,))
@@ -0,0 +1,164 @@
+import gc
+import os
+import logging
+import _thread
+from binascii import hexlify
+try:
+    from hashlib import sha1
+except ImportError:
+    from uhashlib import sha1
+from alvik_logger.logger import get_logger
+
+logger = get_logger("runner")
+
+
+class UPYCompiledScript:
+    """Kompiliertes Skript. `async_main` ist gesetzt, wenn `main()` auf der Event-Loop des Servers laufen soll."""
+
+    def __init__(self, code, async_main: bool, size: int = 0, mtime: int = 0, digest: bytes = b"", cost: int = 0):
+        self.code = code
+        self.async_main = async_main
+        self.size = size
+        self.mtime = mtime
+        self.digest = digest
+        self.cost = cost
+
+
+def _code_lines(source: str):
+    """Liefert die Zeilen von `source` ohne Kommentare und mit leeren String-Literalen (auch Docstrings)."""
+    quote = None  # Begrenzer des offenen Strings, mehrzeilig nur bei drei Anführungszeichen
+    for line in source.split("\n"):
+        code = []
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if quote is not None:
+                if char == "\\":
+                    i += 2
+                    continue
+                if line.startswith(quote, i):
+                    code.append(quote)
+                    i += len(quote)
+                    quote = None
+                    continue
+                i += 1
+                continue
+            if char == "#":
+                break
+            if char in "'\"":
+                quote = char * 3 if line.startswith(char * 3, i) else char
+                code.append(quote)
+                i += len(quote)
+                continue
+            code.append(char)
+            i += 1
+        if quote is not None and len(quote) == 1:
+            quote = None  # einfacher String endet spätestens am Zeilenende
+        yield "".join(code)
+
+
+def has_async_main(source: str) -> bool:
+    """Erkennt ein `async def main(` am Zeilenanfang, ohne den Code auszuführen.
+
+    Treffer in Strings und Kommentaren zählen nicht. Startet das Skript seine
+    Event-Loop selbst (`asyncio.run(`), gilt es nicht als async: es läuft im
+    Thread, denn auf der Loop des Servers ginge das nicht.
+    """
+    found = False
+    for line in _code_lines(source):
+        if "asyncio.run(" in line or "run_until_complete(" in line:
+            return False
+        if line.startswith("async def main("):
+            found = True
+    return found
+
+
+def compile_script(filename: str) -> UPYCompiledScript:
+    """Liest und kompiliert `filename` ohne Cache."""
+    with open(filename, "r") as f:
+        source = f.read()
+    return UPYCompiledScript(compile(source, filename, "exec"), has_async_main(source))
+
+
+class UPYCompileCache:
+    """Hält kompilierte Skripte im Speicher, damit wiederholte Starts nicht neu kompilieren.
+
+    Ein Eintrag gilt, solange Größe und Änderungszeit der Datei gleich sind. Ändern
+    sich diese, aber nicht der Inhalt (SHA-1), wird der Code trotzdem wiederverwendet.
+    Das Budget `max_bytes` wird über die Länge des Quelltexts abgeschätzt; darüber
+    hinaus werden die am längsten nicht benutzten Einträge verworfen.
+
+    `get()` und `invalidate()` dürfen aus verschiedenen Threads aufgerufen werden.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = {}  # Dateiname -> UPYCompiledScript
+        self._lru = []  # Dateinamen, zuletzt benutzter am Ende
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = _thread.allocate_lock()
+
+    def get(self, filename: str) -> UPYCompiledScript:
+        """Liefert das kompilierte Skript zu `filename`, kompiliert bei Bedarf.
+
+        @raise OSError wenn die Datei nicht lesbar ist, SyntaxError bei fehlerhaftem Code.
+        """
+        stat = os.stat(filename)
+        size, mtime = stat[6], stat[8]
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None and entry.size == size and entry.mtime == mtime:
+                self.hits += 1
+                self._touch(filename)
+                return entry
+
+        with open(filename, "r") as f:
+            source = f.read()
+        digest = sha1(source.encode("utf-8")).digest()
+        with self._lock:
+            if entry is not None and entry.digest == digest and self._entries.get(filename) is entry:
+                entry.size, entry.mtime = size, mtime  # nur neu gespeichert, Inhalt gleich
+                self.hits += 1
+                self._touch(filename)
+                return entry
+
+        self.misses += 1
+        script = UPYCompiledScript(compile(source, filename, "exec"), has_async_main(source), size, mtime, digest,
+                                   len(source))
+        del source
+        gc.collect()  # Zwischenstände des Compilers sofort freigeben
+        with self._lock:
+            self._remove(filename)
+            if script.cost <= self.max_bytes:
+                while self._bytes + script.cost > self.max_bytes:
+                    self._remove(self._lru[0])
+                self._entries[filename] = script
+                self._lru.append(filename)
+                self._bytes += script.cost
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Compiled %s (%s), cache %d/%d bytes", filename, hexlify(digest[:4]).decode(), self._bytes,
+                         self.max_bytes)
+        return script
+
+    def invalidate(self, filename: str) -> None:
+        """Verwirft den Eintrag zu `filename`, z. B. nach einem Upload."""
+        with self._lock:
+            self._remove(filename)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._lru = []
+            self._bytes = 0
+
+    def _remove(self, filename: str) -> None:
+        entry = self._entries.pop(filename, None)
+        if entry is not None:
+            self._lru.remove(filename)
+            self._bytes -= entry.cost
+
+    def _touch(self, filename: str) -> None:
+        self._lru.remove(filename)
+        self._lru.append(filename)
@@ -0,0 +1,106 @@
+import os
+import json
+from binascii import hexlify
+try:
+    from hashlib import sha1
+except ImportError:
+    from uhashlib import sha1
+from alvik_utils.utils import ticks_diff, ticks_ms
+
+_S_IFDIR = 0x4000
+
+
+class UPYFileIndex:
+    """Verzeichnisliste als JSON mit Größe, Änderungszeit und optional SHA-1 je Datei.
+
+    Die fertige Antwort wird zwischengespeichert und erst nach `invalidate()` (Upload,
+    Löschen) oder nach `max_age_ms` neu aus dem Flash gelesen; Änderungen durch
+    Skripte oder das Log fallen so spätestens nach `max_age_ms` auf. Das ETag
+    ergibt sich aus dem Inhalt, eine unveränderte Liste bekommt also auch nach
+    dem Neuaufbau dasselbe ETag.
+
+    Hashes werden nur auf Anfrage berechnet und je Datei gemerkt, solange Größe und
+    Änderungszeit gleich bleiben. Dateien über `max_hash_bytes` bleiben ohne Hash.
+    """
+
+    def __init__(self, root: str = ".", max_depth: int = 3, max_age_ms: int = 5000, max_hash_bytes: int = 256 * 1024):
+        self.root = root
+        self.max_depth = max_depth
+        self.max_age_ms = max_age_ms
+        self.max_hash_bytes = max_hash_bytes
+        self._cache = {}  # mit Hashes (bool) -> (Einträge, JSON, ETag, Zeitpunkt in ticks_ms)
+        self._hashes = {}  # Name wie in den Einträgen -> (Größe, Änderungszeit, SHA-1)
+        self.scans = 0
+
+    def invalidate(self) -> None:
+        self._cache = {}
+
+    def _cached(self, with_hashes: bool) -> tuple:
+        cached = self._cache.get(with_hashes)
+        if cached is None or ticks_diff(ticks_ms(), cached[3]) >= self.max_age_ms:
+            entries = self.entries(with_hashes)
+            body = json.dumps(entries)
+            etag = '"' + hexlify(sha1(body.encode("utf-8")).digest()[:8]).decode() + '"'
+            cached = self._cache[with_hashes] = (entries, body, etag, ticks_ms())
+        return cached
+
+    def get(self, with_hashes: bool = False) -> tuple:
+        """@return (JSON-Text, ETag)"""
+        cached = self._cached(with_hashes)
+        return cached[1], cached[2]
+
+    def names(self) -> list:
+        """Nur die Dateinamen, aus demselben Cache."""
+        return [entry["name"] for entry in self._cached(False)[0] if not entry["dir"]]
+
+    def entries(self, with_hashes: bool = False) -> list:
+        """Liest das Verzeichnis ohne Cache."""
+        self.scans += 1
+        entries = []
+        self._walk(self.root, "", 0, with_hashes, entries)
+        if with_hashes:
+            known = set(entry["name"] for entry in entries)
+            for name in [name for name in self._hashes if name not in known]:
+                del self._hashes[name]  # gelöschte Dateien vergessen
+        return entries
+
+    def _walk(self, directory: str, prefix: str, depth: int, with_hashes: bool, entries: list) -> None:
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            return
+        for name in names:
+            path = name if directory == "." else directory + "/" + name
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # zwischen listdir und stat gelöscht
+            is_dir = bool(stat[0] & _S_IFDIR)
+            entry = {"name": prefix + name, "dir": is_dir, "size": 0 if is_dir else stat[6], "mtime": stat[8]}
+            if with_hashes and not is_dir:
+                entry["sha1"] = self._hash(path, entry["name"], stat[6], stat[8])
+            entries.append(entry)
+            if is_dir and depth + 1 < self.max_depth:
+                self._walk(path, prefix + name + "/", depth + 1, with_hashes, entries)
+
+    def _hash(self, path: str, name: str, size: int, mtime: int):
+        known = self._hashes.get(name)
+        if known is not None and known[0] == size and known[1] == mtime:
+            return known[2]
+        if size > self.max_hash_bytes:
+            return None
+        digest = sha1()
+        buf = bytearray(512)
+        mv = memoryview(buf)
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    digest.update(mv[:n])  # ohne Kopie des Blocks
+        except OSError:
+            return None
+        value = hexlify(digest.digest()).decode()
+        self._hashes[name] = (size, mtime, value)
+        return value
@@ -0,0 +1,216 @@
+import time
+from alvik_logger.logger import get_logger
+from alvik_utils.upy_code_runner import UPYCodeRunner, STOP_NOT_RUNNING
+from alvik_utils.upy_run_stats import RUN_ERROR
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+logger = get_logger("runner")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_CANCELLED = "cancelled"
+JOB_TIMEOUT = "timeout"
+# Sonst übernimmt ein Job nach dem Lauf den Status aus `UPYRunStats` (finished, error, stopped, abandoned).
+
+
+class UPYJob:
+    """Ein Auftrag, eine Datei auszuführen."""
+
+    def __init__(self, job_id: int, filename: str, priority: int, time_limit: float, writer, preempt: bool):
+        self.job_id = job_id
+        self.filename = filename
+        self.priority = priority  # höhere Priorität startet zuerst
+        self.time_limit = time_limit  # Sekunden, None = unbegrenzt
+        self.preempt = preempt
+        self.writer = writer  # erster Abonnent der Ausgabe, wird beim Start übergeben
+        self.status = JOB_QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self.runner: UPYCodeRunner = None
+        self.stats = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in (JOB_QUEUED, JOB_RUNNING)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.job_id,
+            "file": self.filename,
+            "priority": self.priority,
+            "time_limit": self.time_limit,
+            "status": self.status,
+            "submitted": self.submitted,
+            "started": self.started,
+            "ended": self.ended,
+            "output_available": self.runner is not None,
+            "run": self.stats.to_dict() if self.stats is not None else None,
+        }
+
+
+class UPYJobQueue:
+    """Führt Skripte nacheinander aus, nach Priorität und innerhalb gleicher Priorität in Eingangsreihenfolge.
+
+    Sobald ein Lauf endet, startet der nächste Job. `runner_factory(filename, writer)`
+    erzeugt den `UPYCodeRunner` für einen Job. Von beendeten Jobs bleiben
+    `max_jobs` in der Liste, die Ausgabe (und damit der Runner) nur von den
+    letzten `keep_output`.
+    """
+
+    def __init__(self, runner_factory, stop_timeout: float = 2, max_jobs: int = 20, keep_output: int = 3):
+        self._runner_factory = runner_factory
+        self.stop_timeout = stop_timeout
+        self.max_jobs = max_jobs
+        self.keep_output = keep_output
+        self._jobs = []  # alle bekannten Jobs, ältester zuerst
+        self._next_id = 1
+        self._current: UPYJob = None
+        self._wakeup = None  # wird mit dem Scheduler-Task in der Event-Loop angelegt
+        self._scheduler = None
+
+    @property
+    def current(self) -> UPYJob:
+        return self._current
+
+    def get(self, job_id: int) -> UPYJob:
+        for job in self._jobs:
+            if job.job_id == job_id:
+                return job
+        return None
+
+    def to_list(self) -> list:
+        return [job.to_dict() for job in self._jobs]
+
+    async def submit(self, filename: str, priority: int = 0, time_limit: float = None, writer=None,
+                     preempt: bool = False) -> UPYJob:
+        """Reiht einen Job ein. Mit `preempt` wird der laufende Job gestoppt und dieser sofort gestartet.
+
+        @raise ValueError wenn `priority` keine ganze Zahl oder `time_limit` keine positive Zahl ist
+        """
+        try:
+            priority = int(priority)
+            time_limit = float(time_limit) if time_limit is not None else None
+        except TypeError:
+            raise ValueError("priority and time_limit must be numbers")
+        if time_limit is not None and not time_limit > 0:  # auch NaN
+            raise ValueError("time_limit must be positive")
+        job = UPYJob(self._next_id, filename, priority, time_limit, writer, preempt)
+        self._next_id += 1
+        self._jobs.append(job)
+        if self._scheduler is None:
+            self._wakeup = asyncio.Event()
+            self._scheduler = asyncio.create_task(self._schedule())
+        self._wakeup.set()
+        if preempt:
+            await self.stop_current()
+        return job
+
+    async def cancel(self, job_id: int) -> bool:
+        """Entfernt einen wartenden Job oder stoppt den laufenden.
+
+        @return False, wenn der Job unbekannt oder bereits beendet ist.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.status == JOB_QUEUED:
+            job.status = JOB_CANCELLED
+            job.ended = time.time()
+            await self._release_writer(job)
+            self._trim()
+        else:
+            job.status = JOB_CANCELLED
+            await job.runner.stop_and_wait(self.stop_timeout)
+        return True
+
+    async def stop_current(self) -> str:
+        """Stoppt den laufenden Job, wartende Jobs starten danach wie geplant."""
+        if self._current is None or self._current.runner is None:
+            return STOP_NOT_RUNNING
+        return await self._current.runner.stop_and_wait(self.stop_timeout)
+
+    async def shutdown(self) -> None:
+        """Verwirft alle wartenden Jobs und stoppt den laufenden."""
+        for job in [job for job in self._jobs if job.status == JOB_QUEUED]:  # cancel() kürzt die Liste
+            await self.cancel(job.job_id)
+        await self.stop_current()
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            self._scheduler = None
+
+    def _next_job(self) -> UPYJob:
+        best = None
+        for job in self._jobs:
+            if job.status != JOB_QUEUED:
+                continue
+            if best is None or (job.preempt, job.priority) > (best.preempt, best.priority):
+                best = job  # bei Gleichstand bleibt der ältere Job vorn
+        return best
+
+    async def _schedule(self) -> None:
+        while True:
+            self._wakeup.clear()
+            job = self._next_job()
+            if job is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await self._execute(job)
+            except Exception as e:
+                logger.error("Job %d (%s) failed to run: %s", job.job_id, job.filename, e)
+                if job.runner is not None and job.runner.is_running:
+                    await job.runner.stop_and_wait(self.stop_timeout)  # sonst liefe das Skript neben dem nächsten Job weiter
+                if job.status != JOB_CANCELLED:
+                    job.status = RUN_ERROR
+                job.ended = time.time()
+                await self._release_writer(job)
+            finally:
+                self._current = None
+                self._trim()
+
+    async def _execute(self, job: UPYJob) -> None:
+        self._current = job
+        job.status = JOB_RUNNING
+        job.started = time.time()
+        runner = self._runner_factory(job.filename, job.writer)
+        job.writer = None
+        job.runner = runner
+        job.stats = runner.stats
+        logger.info("Starting job %d: %s", job.job_id, job.filename)
+        await runner.run_file()
+        try:
+            if job.time_limit:
+                await asyncio.wait_for(runner.wait_done(), job.time_limit)
+            else:
+                await runner.wait_done()
+        except asyncio.TimeoutError:
+            logger.warning("Job %d exceeded its time limit of %s s", job.job_id, job.time_limit)
+            job.status = JOB_TIMEOUT
+            await runner.stop_and_wait(self.stop_timeout)
+        if job.status == JOB_RUNNING:
+            job.status = runner.stats.status
+        job.ended = time.time()
+
+    @staticmethod
+    async def _release_writer(job: UPYJob) -> None:
+        """Beendet den Ausgabe-Stream eines Jobs, der nie gestartet wird."""
+        if job.writer is not None:
+            try:
+                await job.writer.end_events()
+            except OSError:
+                pass
+            job.writer = None
+
+    def _trim(self) -> None:
+        finished = [job for job in self._jobs if job.finished]
+        ran = [job for job in finished if job.runner is not None]
+        for job in ran[:-self.keep_output] if self.keep_output else ran:
+            job.runner = None  # Ausgabe-Ring freigeben, Messwerte bleiben in `stats`
+        excess = len(finished) - self.max_jobs
+        if excess > 0:
+            for job in finished[:excess]:
+                self._jobs.remove(job)
@@ -0,0 +1,221 @@
+from alvik_logger.logger import LEVELS, get_logger
+from alvik_logger.upy_logging_handler import BufferedRotatingFileHandler
+from alvik_utils.upy_output_hub import UPYOutputHub
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+logger = get_logger("fs")
+
+_IDLE_POLLS = 25  # so viele Abfragen ohne Abonnenten, dann endet der Live-Tail
+
+
+def record_level(text: str) -> int:
+    """Level eines Eintrags im Format "[Zeit] asctime - LEVEL - Text", 0 wenn unbekannt."""
+    parts = text.split(" - ", 2)
+    return LEVELS.get(parts[1], 0) if len(parts) == 3 else 0
+
+
+def record_time(text: str):
+    """Zeit eines Eintrags (Präfix des Handlers) in Sekunden der Geräteuhr, None wenn nicht lesbar."""
+    end = text.find("] ", 0, 24)
+    if not text.startswith("[") or end < 0:
+        return None
+    try:
+        return float(text[1:end])
+    except ValueError:
+        return None
+
+
+def _is_record_start(line: bytes) -> bool:
+    """Einträge beginnen mit "[Sekunden.Millisekunden] ", Folgezeilen (z. B. Tracebacks) nicht.
+
+    Ältere Dateien ohne dieses Präfix beginnen jeden Eintrag mit "JJJJ-" (`asctime` unter CPython).
+    """
+    end = line.find(b"] ", 0, 24)
+    if line.startswith(b"[") and end > 1:
+        for byte in line[1:end]:
+            if (byte < 48 or byte > 57) and byte != 46:
+                return False
+        return True
+    if len(line) < 20 or line[4] != 45:
+        return False
+    for byte in line[:4]:
+        if byte < 48 or byte > 57:
+            return False
+    return True
+
+
+def iter_records(filename: str, start: int, end: int, chunk_bytes: int = 512):
+    """Liefert (Offset, Text) für jeden Eintrag, der in [start, end) beginnt.
+
+    Liest blockweise, mehrzeilige Einträge werden zusammengefasst.
+    """
+    if start >= end:
+        return
+    with open(filename, "rb") as f:
+        f.seek(start)
+        pos = start  # Offset des nächsten ungelesenen Bytes
+        line_offset = start
+        pending = b""
+        record_offset = None
+        record_lines = []
+        while pos < end:
+            data = f.read(min(chunk_bytes, end - pos))
+            if not data:
+                break
+            pos += len(data)
+            pending += data
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if _is_record_start(line) and record_lines:
+                    yield record_offset, _decode(record_lines)
+                    record_lines = []
+                if not record_lines:
+                    record_offset = line_offset
+                record_lines.append(line)
+                line_offset += len(line) + 1
+        if pending:
+            record_lines.append(pending)
+        if record_lines:
+            yield record_offset, _decode(record_lines)
+
+
+def _decode(lines: list) -> str:
+    try:
+        return b"\n".join(lines).decode("utf-8")
+    except UnicodeError:
+        return repr(b"\n".join(lines))
+
+
+class _LevelFilter:
+    """Writer-Hülle für den Live-Tail, die nur Einträge ab `min_level` durchlässt."""
+
+    def __init__(self, writer, min_level: int):
+        self._writer = writer
+        self._min_level = min_level
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    async def send_events(self, lines, event_id: int = None) -> None:
+        lines = [line for line in lines if record_level(line) >= self._min_level]
+        if lines:
+            await self._writer.send_events(lines, event_id)
+
+
+class UPYLogReader:
+    """Beantwortet Abfragen auf die Logdatei eines `BufferedRotatingFileHandler`.
+
+    Über dessen dünnen Index wird nur der Teil der Datei gelesen, der für die
+    Abfrage nötig ist. `follow()` hängt einen Client an die neuen Einträge an;
+    dafür sammelt der Handler Einträge in `live`, die alle `live_poll_ms` in einen
+    `UPYOutputHub` übernommen werden. Ohne Abonnenten endet das wieder.
+    """
+
+    def __init__(self, handler: BufferedRotatingFileHandler, chunk_bytes: int = 512, send_bytes: int = 1024,
+                 live_poll_ms: int = 200, live_replay_bytes: int = 2048):
+        self._handler = handler
+        self.chunk_bytes = chunk_bytes
+        self.send_bytes = send_bytes
+        self.live_poll_ms = live_poll_ms
+        self.live_replay_bytes = live_replay_bytes
+        self._hub = None
+        self._feed_task = None
+
+    @property
+    def end(self) -> int:
+        """Schreibt den Puffer und liefert das Dateiende, ab dem neue Einträge beginnen."""
+        self._handler.flush()
+        return self._handler.size
+
+    def _start_for_records(self, count: int) -> int:
+        """Offset eines Indexpunkts, nach dem mindestens `count` Einträge folgen."""
+        start = 0
+        for record_no, offset, _ in self._handler.index:
+            if record_no > self._handler.records - count:
+                break
+            start = offset
+        return start
+
+    def _start_for_time(self, after: float) -> int:
+        start = 0
+        for _, offset, created in self._handler.index:
+            if created > after:
+                break
+            start = offset
+        return start
+
+    def tail(self, count: int, end: int, min_level: int = 0) -> list:
+        """Die letzten `count` Einträge ab `min_level` vor `end` als (Offset, Text)."""
+        window = count
+        while True:
+            start = self._start_for_records(window)
+            records = []
+            for offset, text in iter_records(self._handler.filename, start, end, self.chunk_bytes):
+                if record_level(text) >= min_level:
+                    records.append((offset, text))
+                    if len(records) > 2 * count:
+                        records = records[-count:]
+            if len(records) >= count or start == 0:
+                return records[-count:]
+            window *= 4  # Filter war zu streng: weiter vorne suchen
+
+    def select(self, start: int, end: int, min_level: int = 0, after: float = None):
+        """Liefert (Offset, Text) ab Offset `start` bzw. Zeit `after` bis `end`, nach Level gefiltert."""
+        if after is not None:
+            start = max(start, self._start_for_time(after))
+        for offset, text in iter_records(self._handler.filename, start, end, self.chunk_bytes):
+            if after is not None:
+                created = record_time(text)
+                if created is None or created < after:
+                    continue
+                after = None  # Zeiten sind aufsteigend, der Rest passt
+            if record_level(text) >= min_level:
+                yield offset, text
+
+    async def send(self, writer, records) -> None:
+        """Sendet Einträge blockweise mit `awrite()`.
+
+        Die Header sind dann schon gesendet: schlägt das Lesen oder Senden fehl (z. B.
+        weil die Datei gerade rotiert wurde), endet die Antwort einfach früher.
+        """
+        chunk = []
+        size = 0
+        try:
+            for _, text in records:
+                chunk.append(text)
+                size += len(text) + 1
+                if size >= self.send_bytes:
+                    await writer.awrite(("\n".join(chunk) + "\n").encode("utf-8"))
+                    chunk = []
+                    size = 0
+            if chunk:
+                await writer.awrite(("\n".join(chunk) + "\n").encode("utf-8"))
+        except OSError as e:
+            logger.warning("Sending %s failed: %s", self._handler.filename, e)
+
+    def follow(self, writer, last_seq: int = 0, min_level: int = 0) -> None:
+        """Sendet neue Einträge als Event-Stream an `writer`, fortsetzbar per `Last-Event-ID`."""
+        if self._hub is None:
+            self._hub = UPYOutputHub(self.live_replay_bytes)
+            self._handler.live = []
+            self._feed_task = asyncio.create_task(self._feed(self._hub))
+        target = _LevelFilter(writer, min_level) if min_level else writer
+        self._hub.attach(target, last_seq)
+
+    async def _feed(self, hub: UPYOutputHub) -> None:
+        idle = 0
+        while True:
+            await asyncio.sleep(self.live_poll_ms / 1000)
+            entries = self._handler.take_live()
+            if entries:
+                hub.publish([entry.rstrip("\n") for entry in entries])
+            idle = idle + 1 if not hub.subscriber_count else 0
+            if idle > _IDLE_POLLS:
+                self._handler.live = None
+                self._hub = None
+                hub.finish()
+                return
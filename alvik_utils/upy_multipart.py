@@ -0,0 +1,129 @@
+from alvik_utils.upy_streamreader import UPYHTTPBody, HTTPError
+from alvik_utils.utils import find_bytes
+
+CHUNK_SIZE = 1024
+
+
+def get_multipart_boundary(content_type: str) -> str:
+    """Liest die Boundary aus einem `multipart/form-data` Content-Type Header."""
+    if content_type is None or not content_type.lower().startswith("multipart/form-data"):
+        raise HTTPError(400, "Expected multipart/form-data")
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary" and value:
+            return value.strip('"')
+    raise HTTPError(400, "Missing multipart boundary")
+
+
+def _parse_disposition(value: str) -> dict:
+    """Zerlegt `form-data; name="file"; filename="a.py"` in ein Dictionary."""
+    params = {}
+    for param in value.split(";")[1:]:
+        key, _, val = param.strip().partition("=")
+        params[key.lower()] = val.strip('"')
+    return params
+
+
+class UPYMultipartPart:
+    """Ein Teil eines Multipart-Bodys. Die Daten werden blockweise über `read_chunk()` gelesen."""
+
+    def __init__(self, reader: "UPYMultipartReader", headers: dict):
+        self._reader = reader
+        self.headers = headers
+        disposition = _parse_disposition(headers.get("content-disposition", ""))
+        self.name = disposition.get("name")
+        self.filename = disposition.get("filename")
+
+    async def read_chunk(self):
+        """Gibt den nächsten Datenblock als memoryview zurück (leer am Ende des Teils).
+
+        Der Block ist nur bis zum nächsten Aufruf gültig.
+        """
+        return await self._reader.read_chunk()
+
+
+class UPYMultipartReader:
+    """Streamender Parser für `multipart/form-data`.
+
+    Der Body wird in einen festen Puffer gelesen, Teile werden ohne Kopie blockweise
+    weitergereicht. Der Speicherbedarf ist unabhängig von der Größe der Dateien.
+    """
+
+    def __init__(self, body: UPYHTTPBody, boundary: str, chunk_size: int = CHUNK_SIZE):
+        self._body = body
+        self._delimiter = b"\r\n--" + boundary.encode()
+        self._buf = bytearray(chunk_size + len(self._delimiter))
+        self._mv = memoryview(self._buf)
+        # Der erste Delimiter steht ohne führendes CRLF am Anfang des Bodys
+        self._buf[0:2] = b"\r\n"
+        self._start = 0
+        self._end = 2
+        self._in_part = True  # die Präambel wird wie ein Teil behandelt und verworfen
+        self._finished = False
+
+    async def _fill(self) -> int:
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._start > 0:
+            pending = bytes(self._mv[self._start:self._end])
+            self._end = len(pending)
+            self._mv[:self._end] = pending
+            self._start = 0
+        if self._end == len(self._buf):
+            raise HTTPError(400, "Multipart header too large")
+        n = await self._body.readinto(self._mv[self._end:])
+        self._end += n
+        return n
+
+    async def read_chunk(self):
+        """Gibt den nächsten Datenblock des aktuellen Teils zurück (leer am Ende des Teils)."""
+        while self._in_part:
+            idx = find_bytes(self._buf, self._delimiter, self._start, self._end)
+            if idx >= 0:
+                chunk = self._mv[self._start:idx]
+                self._start = idx + len(self._delimiter)
+                self._in_part = False
+                return chunk
+            # Ende des Puffers könnte der Anfang eines Delimiters sein und bleibt stehen
+            safe_end = self._end - len(self._delimiter) + 1
+            if safe_end > self._start:
+                chunk = self._mv[self._start:safe_end]
+                self._start = safe_end
+                return chunk
+            if await self._fill() == 0:
+                raise HTTPError(400, "Unexpected end of multipart body")
+        return self._mv[0:0]
+
+    async def next_part(self) -> UPYMultipartPart:
+        """Springt zum nächsten Teil und liest dessen Header.
+
+        @return None, wenn alle Teile gelesen wurden.
+        """
+        while len(await self.read_chunk()) > 0:
+            pass  # Rest des vorherigen Teils verwerfen
+        if self._finished:
+            return None
+        while self._end - self._start < 2:
+            if await self._fill() == 0:
+                raise HTTPError(400, "Unexpected end of multipart body")
+        if bytes(self._mv[self._start:self._start + 2]) == b"--":
+            self._finished = True
+            await self._body.drain()  # Epilog verwerfen
+            return None
+        scan = self._start
+        while True:
+            idx = find_bytes(self._buf, b"\r\n\r\n", scan, self._end)
+            if idx >= 0:
+                break
+            offset = max(0, self._end - self._start - 3)
+            if await self._fill() == 0:
+                raise HTTPError(400, "Unexpected end of multipart body")
+            scan = self._start + offset
+        headers = {}
+        for line in bytes(self._mv[self._start + 2:idx]).decode("utf-8").split("\r\n"):
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        self._start = idx + 4
+        self._in_part = True
+        return UPYMultipartPart(self, headers)
@@ -0,0 +1,161 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+from alvik_logger.logger import get_logger
+from alvik_utils.utils import ticks_add, ticks_diff, ticks_ms
+
+logger = get_logger("http")
+_LINE_OVERHEAD = 16  # geschätzter Speicherbedarf einer Zeile zusätzlich zu ihrem Text
+
+
+class UPYOutputHub:
+    """Verteilt die Ausgabe eines laufenden Skripts an beliebig viele Abonnenten.
+
+    Jede Zeile bekommt eine fortlaufende Sequenznummer und landet in einem auf
+    `max_replay_bytes` begrenzten Ring. Abonnenten (`subscribe()`) lesen daraus in
+    ihrem eigenen Tempo und können ab einer bekannten Nummer fortsetzen
+    (`Last-Event-ID`). Wer so weit zurückfällt, dass seine Zeilen aus dem Ring
+    verdrängt wurden, wird getrennt; der Erzeuger wartet nie auf das Netzwerk.
+
+    Writer brauchen `send_events(lines, event_id)` und `end_events()`; haben sie
+    `write_pending_since` und `abort()` (wie `UPYStreamWriter`), wird ein Abonnent,
+    dessen Schreibvorgang hängt, damit getrennt.
+    """
+
+    def __init__(self, max_replay_bytes: int = 4096, max_batch_bytes: int = 1024):
+        self.max_replay_bytes = max_replay_bytes
+        self.max_batch_bytes = max_batch_bytes
+        self._lines = []
+        self._offset = 0  # Index von `first_seq` in `_lines`
+        self._bytes = 0
+        self.first_seq = 1  # älteste noch abrufbare Zeile
+        self.next_seq = 1
+        self.finished = False
+        self._changed = asyncio.Event()  # neue Ausgabe oder Ende
+        self._progress = asyncio.Event()  # ein Abonnent hat Zeilen gesendet
+        self._subscribers = []
+        self._tasks = []  # Tasks von `attach()`, damit sie nicht vorzeitig eingesammelt werden
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, lines: list) -> None:
+        """Hängt Zeilen an den Ring an und weckt alle Abonnenten."""
+        for line in lines:
+            self._lines.append(line)
+            self._bytes += len(line) + _LINE_OVERHEAD
+            self.next_seq += 1
+        while self._bytes > self.max_replay_bytes and self.first_seq < self.next_seq - 1:
+            self._bytes -= len(self._lines[self._offset]) + _LINE_OVERHEAD
+            self._lines[self._offset] = None
+            self._offset += 1
+            self.first_seq += 1
+        if self._offset > 32 and self._offset * 2 > len(self._lines):
+            self._lines = self._lines[self._offset:]  # verdrängte Einträge gelegentlich freigeben
+            self._offset = 0
+        self._notify()
+
+    def finish(self) -> None:
+        """Keine weitere Ausgabe. Abonnenten erhalten den Rest und dann das Ende."""
+        self.finished = True
+        self._notify()
+
+    def _notify(self) -> None:
+        changed = self._changed
+        self._changed = asyncio.Event()
+        changed.set()
+
+    def _lines_after(self, seq: int) -> list:
+        batch = []
+        size = 0
+        index = self._offset + seq + 1 - self.first_seq
+        while index < len(self._lines) and size < self.max_batch_bytes:
+            line = self._lines[index]
+            batch.append(line)
+            size += len(line) + _LINE_OVERHEAD
+            index += 1
+        return batch
+
+    async def drain(self, timeout_ms: int = 2000) -> None:
+        """Wartet, bis kein Abonnent mehr als den halben Ring im Rückstand ist.
+
+        Wer nach `timeout_ms` noch zurückliegt, wird getrennt. Ohne Abonnenten kehrt
+        die Methode sofort zurück.
+        """
+        limit = (self.next_seq - self.first_seq) // 2
+        deadline = ticks_add(ticks_ms(), timeout_ms)
+        while True:
+            lagging = [s for s in self._subscribers if self.next_seq - 1 - s.cursor > limit]
+            if not lagging:
+                return
+            remaining = ticks_diff(deadline, ticks_ms())
+            if remaining > 0:
+                progress = self._progress
+                try:
+                    await asyncio.wait_for(progress.wait(), remaining / 1000)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            for subscriber in lagging:
+                logger.warning("Output subscriber too slow, disconnecting.")
+                subscriber.drop()
+            self._notify()  # wartende Abonnenten-Tasks beenden sich
+            return
+
+    def attach(self, writer, last_seq: int = 0) -> None:
+        """Startet `subscribe()` als Task, dessen Referenz der Hub bis zum Ende hält."""
+        self._tasks = [task for task in self._tasks if not task.done()]
+        self._tasks.append(asyncio.create_task(self.subscribe(writer, last_seq)))
+
+    async def subscribe(self, writer, last_seq: int = 0) -> None:
+        """Sendet die Ausgabe ab Sequenznummer `last_seq + 1` an `writer`, bis das Skript endet.
+
+        `last_seq` wird auf den Ring begrenzt. Der Stream endet immer mit `end_events()`,
+        auch für getrennte Abonnenten, sonst verbindet sich ein EventSource endlos neu.
+        """
+        subscriber = _Subscriber(writer, min(max(last_seq, self.first_seq - 1), self.next_seq - 1))
+        self._subscribers.append(subscriber)
+        try:
+            missed = subscriber.cursor - max(last_seq, 0)
+            if missed > 0:
+                await writer.send_events((f"[{missed} lines no longer available]",), subscriber.cursor)
+            while not subscriber.dropped:
+                if subscriber.cursor + 1 < self.first_seq:
+                    break  # Zeilen wurden während des Sendens verdrängt
+                changed = self._changed
+                batch = self._lines_after(subscriber.cursor)
+                if batch:
+                    last_id = subscriber.cursor + len(batch)
+                    await writer.send_events(batch, last_id)
+                    subscriber.cursor = last_id
+                    progress = self._progress
+                    self._progress = asyncio.Event()
+                    progress.set()
+                elif self.finished:
+                    break
+                else:
+                    await changed.wait()
+        except OSError:
+            pass  # Client hat die Verbindung getrennt
+        finally:
+            self._subscribers.remove(subscriber)
+            try:
+                await writer.end_events()
+            except OSError:
+                pass  # nach `drop()` oder Verbindungsabbruch ist der Writer schon geschlossen
+
+
+class _Subscriber:
+    def __init__(self, writer, cursor: int):
+        self.writer = writer
+        self.cursor = cursor  # zuletzt gesendete Sequenznummer
+        self.dropped = False
+
+    def drop(self) -> None:
+        """Trennt den Abonnenten; ohne hängenden Schreibvorgang erhält er noch das `exit`-Event."""
+        if not self.dropped:
+            self.dropped = True
+            if getattr(self.writer, "write_pending_since", None) is not None:
+                self.writer.abort()  # unterbricht ein hängendes drain()
@@ -0,0 +1,73 @@
+import sys
+import _thread
+import builtins
+
+_real_import = builtins.__import__
+# MicroPython wertet `__builtins__` im Namensraum eines Skripts nicht aus
+_NAMESPACE_BUILTINS = sys.implementation.name != "micropython"
+
+_routes = {}  # Thread-ID -> UPYOutputRoute, nur ohne `_NAMESPACE_BUILTINS`
+_hook_installed = False
+
+
+def _dispatch_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """`__import__`, der für gebundene Threads die Module ihres Laufs liefert."""
+    if _routes and level == 0:
+        route = _routes.get(_thread.get_ident())
+        if route is not None:
+            module = route.modules.get(name)
+            if module is not None:
+                return module
+    return _real_import(name, globals, locals, fromlist, level)
+
+
+class UPYOutputRoute:
+    """Leitet `print()` und Modul-Importe eines einzelnen Skriptlaufs um, ohne Interpreter-Globals zu verändern.
+
+    `print` landet direkt im Namensraum des Skripts. `import sys` / `import time`
+    liefern die Ersatzmodule aus `modules`: unter CPython über ein eigenes
+    `__builtins__` im Namensraum, unter MicroPython über einen einmalig
+    installierten `__import__`, der nach Thread-ID verteilt (`bind()`/`unbind()`).
+    `builtins.print` und `sys.modules` bleiben unangetastet, Ausgabe des Servers
+    geht also weiter ohne Umweg an die Konsole, und mehrere Läufe können
+    gleichzeitig existieren.
+
+    Ausgabe aus Modulen, die das Skript selbst importiert, wird nicht umgeleitet.
+    """
+
+    def __init__(self, print_function, modules: dict):
+        self.print = print_function
+        self.modules = modules
+
+    def namespace(self, names: dict = None) -> dict:
+        """Globals für `exec()`; `names` wird zusätzlich eingetragen."""
+        namespace = {"__name__": "__main__", "print": self.print}
+        if names:
+            namespace.update(names)
+        if _NAMESPACE_BUILTINS:
+            script_builtins = dict(builtins.__dict__)
+            script_builtins["print"] = self.print
+            script_builtins["__import__"] = self._import
+            namespace["__builtins__"] = script_builtins
+        return namespace
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0:
+            module = self.modules.get(name)
+            if module is not None:
+                return module
+        return _real_import(name, globals, locals, fromlist, level)
+
+    def bind(self) -> None:
+        """Ordnet Importe des aufrufenden Threads diesem Lauf zu (nur nötig unter MicroPython)."""
+        global _hook_installed
+        if _NAMESPACE_BUILTINS:
+            return
+        if not _hook_installed:
+            builtins.__import__ = _dispatch_import
+            _hook_installed = True
+        _routes[_thread.get_ident()] = self
+
+    def unbind(self) -> None:
+        if _routes.get(_thread.get_ident()) is self:
+            del _routes[_thread.get_ident()]
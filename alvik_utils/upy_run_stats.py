@@ -0,0 +1,136 @@
+import gc
+import time
+import _thread
+from alvik_utils.utils import ticks_diff, ticks_ms
+try:
+    import tracemalloc  # nur CPython, liefert Werte nur bei laufendem Tracing
+except ImportError:
+    tracemalloc = None
+
+RUN_RUNNING = "running"
+RUN_FINISHED = "finished"
+RUN_ERROR = "error"
+RUN_STOPPED = "stopped"
+RUN_ABANDONED = "abandoned"
+
+
+def heap_usage() -> tuple:
+    """@return (belegter Heap, freier Heap) in Bytes, None, wo nicht messbar."""
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc(), gc.mem_free()
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0], None
+    return None, None
+
+
+def cpu_time_ms():
+    """CPU-Zeit des aufrufenden Threads (CPython), sonst None."""
+    if hasattr(time, "thread_time"):
+        return int(time.thread_time() * 1000)
+    return None
+
+
+class UPYRunStats:
+    """Messwerte eines Skriptlaufs: Laufzeit, CPU-Zeit, Heap-Höchststand, Ausgabe und Ergebnis.
+
+    `sample()` wird während des Laufs regelmäßig aus der Event-Loop aufgerufen. Wie
+    spät diese Aufrufe kommen (`max_loop_lag_ms`), zeigt, ob das Skript den
+    Webserver ausbremst.
+
+    `cpu_ms` ist die CPU-Zeit des Skript-Threads und nur für Thread-Läufe unter
+    CPython messbar. Bei async-Läufen teilt sich das Skript den Thread mit der
+    Event-Loop, aufgegebene Threads enden nach der Messung; dann bleibt es None.
+    """
+
+    def __init__(self, filename: str):
+        self.run_id = 0  # vergibt UPYRunHistory
+        self.filename = filename
+        self.mode = None  # "async" oder "thread"
+        self.status = RUN_RUNNING
+        self.error = None
+        self.started = time.time()
+        self.ended = None
+        self._started_ticks = ticks_ms()
+        self.duration_ms = None
+        self._cpu_start = None
+        self._cpu_thread = None
+        self.cpu_ms = None
+        self.heap_start, self.heap_min_free = heap_usage()
+        self.heap_peak = self.heap_start
+        self.samples = 0
+        self.max_loop_lag_ms = 0
+        self.lines = 0
+        self.bytes = 0
+        self.dropped = 0
+
+    def begin(self, mode: str) -> None:
+        """Im ausführenden Thread aufrufen, damit die CPU-Zeit diesem Thread zugeordnet wird."""
+        self.mode = mode
+        if mode == "thread":
+            self._cpu_start = cpu_time_ms()
+            self._cpu_thread = _thread.get_ident()
+
+    def sample(self, loop_lag_ms: int = 0) -> None:
+        allocated, free = heap_usage()
+        if allocated is not None and (self.heap_peak is None or allocated > self.heap_peak):
+            self.heap_peak = allocated
+        if free is not None and (self.heap_min_free is None or free < self.heap_min_free):
+            self.heap_min_free = free
+        if loop_lag_ms > self.max_loop_lag_ms:
+            self.max_loop_lag_ms = loop_lag_ms
+        self.samples += 1
+
+    def finish(self, status: str, error: str = None) -> None:
+        """Schließt die Messung ab. Ein bereits gesetztes Ergebnis bleibt erhalten."""
+        if self.status != RUN_RUNNING:
+            return
+        self.sample()
+        self.status = status
+        self.error = error
+        self.ended = time.time()
+        self.duration_ms = ticks_diff(ticks_ms(), self._started_ticks)
+        if self._cpu_start is not None and _thread.get_ident() == self._cpu_thread:
+            self.cpu_ms = cpu_time_ms() - self._cpu_start  # nur im selben Thread wie `begin()` aussagekräftig
+
+    def to_dict(self) -> dict:
+        duration_ms = self.duration_ms
+        if duration_ms is None:
+            duration_ms = ticks_diff(ticks_ms(), self._started_ticks)
+        return {
+            "id": self.run_id,
+            "file": self.filename,
+            "mode": self.mode,
+            "status": self.status,
+            "error": self.error,
+            "started": self.started,
+            "ended": self.ended,
+            "duration_ms": duration_ms,
+            "cpu_ms": self.cpu_ms,
+            "heap_start": self.heap_start,
+            "heap_peak": self.heap_peak,
+            "heap_min_free": self.heap_min_free,
+            "max_loop_lag_ms": self.max_loop_lag_ms,
+            "samples": self.samples,
+            "lines": self.lines,
+            "bytes": self.bytes,
+            "dropped": self.dropped,
+        }
+
+
+class UPYRunHistory:
+    """Die letzten `max_runs` Läufe, ältester zuerst."""
+
+    def __init__(self, max_runs: int = 20):
+        self.max_runs = max_runs
+        self._runs = []
+        self._next_id = 1
+
+    def add(self, stats: UPYRunStats) -> None:
+        stats.run_id = self._next_id
+        self._next_id += 1
+        self._runs.append(stats)
+        if len(self._runs) > self.max_runs:
+            self._runs.pop(0)
+
+    def to_list(self) -> list:
+        return [stats.to_dict() for stats in self._runs]
@@ -0,0 +1,264 @@
+from alvik_utils.utils import ticks_ms, ticks_diff, ticks_add, find_bytes, url_decode
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+BUFFER_SIZE = 1024
+MAX_HEADER_SIZE = 2048
+MAX_LINE_SIZE = 256
+
+
+class HTTPError(Exception):
+    """Fehler beim Lesen einer Anfrage, der mit dem HTTP Status Code `status` beantwortet wird."""
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class UPYHTTPBody:
+    """Body einer HTTP-Anfrage als Stream (Content-Length oder `Transfer-Encoding: chunked`)."""
+
+    def __init__(self, stream: "UPYStreamReader", headers: dict):
+        self._stream = stream
+        self._deadline = ticks_add(ticks_ms(), int(stream.body_timeout * 1000))  # für den gesamten Body
+        self._chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self.length = None
+        self._remaining = 0  # Restbytes des Bodys bzw. des aktuellen Chunks
+        self._chunk_open = False
+        if not self._chunked:
+            try:
+                self.length = int(headers.get("content-length", "0"))
+            except ValueError:
+                raise HTTPError(400, "Invalid Content-Length")
+            if self.length < 0:
+                raise HTTPError(400, "Invalid Content-Length")
+            self._remaining = self.length
+        self._eof = not self._chunked and self._remaining == 0
+
+    @property
+    def eof(self) -> bool:
+        return self._eof
+
+    async def _next_chunk(self) -> None:
+        if self._chunk_open:
+            await self._stream.readline(self._deadline)  # CRLF nach den Daten des vorherigen Chunks
+        line = await self._stream.readline(self._deadline)
+        try:
+            size = int(line.split(b";")[0].strip().decode(), 16)
+            if size < 0:
+                raise ValueError(size)
+        except ValueError:
+            raise HTTPError(400, "Invalid chunk size")
+        self._chunk_open = True
+        self._remaining = size
+        if size == 0:
+            # Trailer bis zur Leerzeile überspringen
+            while (await self._stream.readline(self._deadline)).strip():
+                pass
+            self._eof = True
+
+    async def readinto(self, buf) -> int:
+        """Liest höchstens `len(buf)` Bytes des Bodys nach `buf`. Gibt 0 am Ende des Bodys zurück."""
+        if self._eof:
+            return 0
+        if self._chunked and self._remaining == 0:
+            await self._next_chunk()
+            if self._eof:
+                return 0
+        mv = memoryview(buf)
+        if len(mv) > self._remaining:
+            mv = mv[:self._remaining]
+        n = await self._stream.readinto(mv, self._deadline)
+        if n == 0:
+            raise HTTPError(400, "Unexpected end of body")
+        self._remaining -= n
+        if not self._chunked and self._remaining == 0:
+            self._eof = True
+        return n
+
+    async def read(self, size: int = -1) -> bytes:
+        """Liest `size` Bytes bzw. den gesamten Rest des Bodys. Nur für kleine Bodys gedacht."""
+        data = bytearray()
+        buf = bytearray(BUFFER_SIZE)
+        while size < 0 or len(data) < size:
+            n = await self.readinto(buf if size < 0 else memoryview(buf)[:min(BUFFER_SIZE, size - len(data))])
+            if n == 0:
+                break
+            data.extend(memoryview(buf)[:n])
+        return bytes(data)
+
+    async def drain(self) -> None:
+        """Verwirft den ungelesenen Rest des Bodys."""
+        buf = bytearray(MAX_LINE_SIZE)
+        while await self.readinto(buf):
+            pass
+
+
+class UPYHTTPRequest:
+    """Geparste Request-Line und Header einer HTTP-Anfrage. Header-Namen sind kleingeschrieben."""
+
+    def __init__(self, method: str, target: str, version: str, headers: dict, body: UPYHTTPBody,
+                 stream: "UPYStreamReader" = None):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.stream = stream  # Verbindung, z. B. für WebSocket-Upgrades
+        path, _, query_string = target.partition("?")
+        self.path = path
+        self.query_string = query_string
+        self.params = {}  # Pfad-Parameter, werden vom Router gesetzt
+        self._query = None
+
+    def header(self, name: str, default: str = None) -> str:
+        return self.headers.get(name.lower(), default)
+
+    @property
+    def query(self) -> dict:
+        """Query-Parameter als Dictionary, wird beim ersten Zugriff geparst."""
+        if self._query is None:
+            query = {}
+            for pair in self.query_string.split("&"):
+                if pair:
+                    key, _, value = pair.partition("=")
+                    query[url_decode(key, True)] = url_decode(value, True)
+            self._query = query
+        return self._query
+
+
+class UPYStreamReader:
+    """Liest HTTP/1.1-Anfragen inkrementell in einen einmalig allozierten Puffer.
+
+    Request-Line und Header werden genau einmal geparst, der Body wird über
+    `UPYHTTPBody` gestreamt. Der Speicherbedarf pro Verbindung ist dadurch
+    unabhängig von der Größe der Anfrage.
+    """
+
+    def __init__(self, reader, block_size: int = BUFFER_SIZE, max_header_size: int = MAX_HEADER_SIZE,
+                 timeout: float = 10, body_timeout: float = 60):
+        self._reader = reader
+        self._buf = bytearray(max(block_size, max_header_size))
+        self._mv = memoryview(self._buf)
+        self._start = 0  # erstes noch nicht gelesenes Byte im Puffer
+        self._end = 0  # Ende der gültigen Daten im Puffer
+        self._max_header_size = max_header_size
+        self._readinto = getattr(reader, "readinto", None)
+        self.timeout = timeout  # Deadline für Request-Line und Header, Timeout pro Lesevorgang (None = keiner)
+        self.body_timeout = body_timeout  # Deadline für den gesamten Body
+        self.bytes_received = 0
+
+    async def _read_some(self, mv) -> int:
+        if self._readinto is not None:
+            return await self._readinto(mv) or 0
+        data = await self._reader.read(len(mv))  # CPython kennt kein readinto()
+        mv[:len(data)] = data
+        return len(data)
+
+    async def _fill(self, deadline: int = None) -> int:
+        """Liest weitere Daten vom Socket in den Puffer."""
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._end == len(self._buf):
+            pending = bytes(self._mv[self._start:self._end])
+            self._end = len(pending)
+            self._mv[:self._end] = pending
+            self._start = 0
+        timeout = self.timeout
+        if deadline is not None:
+            remaining = ticks_diff(deadline, ticks_ms())
+            if remaining <= 0:
+                raise HTTPError(408, "Request Timeout")
+            timeout = remaining / 1000 if timeout is None else min(timeout, remaining / 1000)
+        if timeout is None:  # z. B. WebSockets, die beliebig lange ruhen dürfen
+            n = await self._read_some(self._mv[self._end:])
+            self._end += n
+            self.bytes_received += n
+            return n
+        try:
+            n = await asyncio.wait_for(self._read_some(self._mv[self._end:]), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Request Timeout")
+        self._end += n
+        self.bytes_received += n
+        return n
+
+    def _find(self, needle: bytes, start: int) -> int:
+        return find_bytes(self._buf, needle, start, self._end)
+
+    async def readinto(self, mv, deadline: int = None) -> int:
+        """Liest höchstens `len(mv)` Bytes, zuerst aus dem Puffer, dann vom Socket."""
+        if self._start == self._end and await self._fill(deadline) == 0:
+            return 0
+        n = min(len(mv), self._end - self._start)
+        mv[:n] = self._mv[self._start:self._start + n]
+        self._start += n
+        return n
+
+    async def readline(self, deadline: int = None) -> bytes:
+        """Liest eine Zeile inklusive CRLF (für Chunk-Header)."""
+        scan = self._start
+        while True:
+            idx = self._find(b"\n", scan)
+            if idx >= 0:
+                line = bytes(self._mv[self._start:idx + 1])
+                self._start = idx + 1
+                return line
+            if self._end - self._start >= MAX_LINE_SIZE:
+                raise HTTPError(400, "Line too long")
+            offset = self._end - self._start
+            if await self._fill(deadline) == 0:
+                raise HTTPError(400, "Unexpected end of stream")
+            scan = self._start + offset
+
+    async def read_request(self, idle_timeout: float = None) -> UPYHTTPRequest:
+        """Liest Request-Line und Header der nächsten Anfrage.
+
+        @param idle_timeout Maximale Wartezeit auf das erste Byte der Anfrage (Keep-Alive).
+        @return None, wenn die Verbindung ohne weitere Daten geschlossen wurde oder
+                innerhalb von `idle_timeout` keine Anfrage begonnen hat.
+        """
+        if self._start == self._end:
+            try:
+                idle_deadline = ticks_add(ticks_ms(), int((idle_timeout or self.timeout) * 1000))
+                if await self._fill(idle_deadline) == 0:
+                    return None
+            except HTTPError:
+                return None
+        deadline = ticks_add(ticks_ms(), int(self.timeout * 1000))
+        scan = self._start
+        while True:
+            idx = self._find(b"\r\n\r\n", scan)
+            if idx >= 0:
+                break
+            if self._end - self._start >= self._max_header_size:
+                raise HTTPError(431, "Request Header Fields Too Large")
+            offset = max(0, self._end - self._start - 3)
+            if await self._fill(deadline) == 0:
+                if self._start == self._end:
+                    return None
+                raise HTTPError(400, "Incomplete request")
+            scan = self._start + offset
+        head = bytes(self._mv[self._start:idx])
+        self._start = idx + 4
+        try:
+            head = head.decode("utf-8")
+        except UnicodeError:
+            raise HTTPError(400, "Invalid encoding in request head")
+
+        lines = head.split("\r\n")
+        while lines and not lines[0]:
+            lines.pop(0)  # Leerzeilen vor der Request-Line ignorieren
+        parts = lines[0].split(" ") if lines else []
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            if ":" not in line:
+                raise HTTPError(400, "Malformed header")
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        return UPYHTTPRequest(method, target, version, headers, UPYHTTPBody(self, headers), self)
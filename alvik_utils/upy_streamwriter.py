@@ -1,49 +1,246 @@
 from asyncio import StreamWriter
 
-from alvik_utils.utils import is_micropython
+from alvik_utils.utils import is_micropython, ticks_ms
 
 HTTP_STATUS_CODES = {
+    101: "Switching Protocols",
     200: "OK",
     201: "Created",
     204: "No Content",
     301: "Moved Permanently",
     302: "Found",
+    304: "Not Modified",
     400: "Bad Request",
     401: "Unauthorized",
     403: "Forbidden",
     404: "Not Found",
+    408: "Request Timeout",
+    409: "Conflict",
+    413: "Payload Too Large",
+    426: "Upgrade Required",
+    431: "Request Header Fields Too Large",
     500: "Internal Server Error",
+    501: "Not Implemented",
     502: "Bad Gateway",
     503: "Service Unavailable",
 }
+HEADER_BUFFER_SIZE = 256
+_MAX_ENCODED_NAMES = 32
+
+_status_lines = {}  # Status Code -> vorkodierte Status-Line
+_encoded_names = {}  # Header-Namen -> bytes
+# Nur feste, häufige Werte; ETags, Datumsangaben usw. werden direkt kodiert
+_encoded_values = {value: value.encode() for value in (
+    "text/plain", "text/plain; charset=utf-8", "text/html; charset=utf-8", "text/css", "application/javascript",
+    "application/json", "application/octet-stream", "text/event-stream", "no-cache", "keep-alive", "close",
+    "chunked", "gzip", "Accept-Encoding", "websocket", "Upgrade")}
+
+
+def _status_line(http_status_code: int) -> bytes:
+    line = _status_lines.get(http_status_code)
+    if line is None:
+        line = f"HTTP/1.1 {http_status_code} {HTTP_STATUS_CODES.get(http_status_code, 'Unknown')}\r\n".encode()
+        _status_lines[http_status_code] = line
+    return line
+
+
+def _encoded_name(name: str) -> bytes:
+    data = _encoded_names.get(name)
+    if data is None:
+        data = name.encode()
+        if len(_encoded_names) < _MAX_ENCODED_NAMES:
+            _encoded_names[name] = data
+    return data
+
+
+def _encoded_value(value: str) -> bytes:
+    data = _encoded_values.get(value)
+    return value.encode() if data is None else data
+
+
 class UPYStreamWriter:
     def __init__(self, writer: StreamWriter):
         self._writer = writer
         self._is_micropython = is_micropython()
         self.keep_open = False  # in case of streams
+        self.keep_alive = False  # wird vom Server pro Anfrage gesetzt
+        self.idle = False  # wartet auf die nächste Anfrage, wird vom Server gesetzt
+        self._header_buf = bytearray(HEADER_BUFFER_SIZE)  # wird für alle Antworten der Verbindung wiederverwendet
+        self._header_len = 0
+        self.write_pending_since = None  # ticks_ms() des Beginns eines noch laufenden Schreibvorgangs
+        self.on_close = None  # Callback(writer), wird beim Schließen einmalig aufgerufen
+        self.closed = False
 
-    async def send_response(self, http_status_code: int, content: str="", content_type:str="text/plain", connection:str="close") -> None:
-        response = f"HTTP/1.1 {http_status_code} {HTTP_STATUS_CODES.get(http_status_code, 'Unknown')}\r\n"
-        response += f"Content-Type: {content_type}\r\n"
-        response += f"Connection: {connection}\r\n\r\n"
-        response += content
-        await self.awrite(response.encode("utf-8"))
+    def _reserve(self, size: int) -> int:
+        """Reserviert `size` Bytes im Header-Puffer und gibt deren Startindex zurück."""
+        start = self._header_len
+        end = start + size
+        if end > len(self._header_buf):
+            # Sehr lange Header: Puffer einmalig vergrößern
+            buf = bytearray(max(end, 2 * len(self._header_buf)))
+            buf[:start] = memoryview(self._header_buf)[:start]
+            self._header_buf = buf
+        self._header_len = end
+        return start
+
+    def _put(self, data) -> None:
+        start = self._reserve(len(data))
+        self._header_buf[start:self._header_len] = data
+
+    def _put_int(self, value: int) -> None:
+        """Schreibt die Dezimaldarstellung von `value` ohne Zwischen-String in den Header-Puffer."""
+        digits, rest = 1, value
+        while rest >= 10:
+            rest //= 10
+            digits += 1
+        pos = self._reserve(digits) + digits - 1
+        while True:
+            self._header_buf[pos] = 48 + value % 10  # ASCII '0' + Ziffer
+            value //= 10
+            if not value:
+                break
+            pos -= 1
+
+    def _put_header(self, name: bytes, value) -> None:
+        self._put(name)
+        self._put(b": ")
+        if isinstance(value, int):
+            self._put_int(value)
+        else:
+            self._put(_encoded_value(value) if isinstance(value, str) else value)
+        self._put(b"\r\n")
+
+    def _build_headers(self, http_status_code: int, headers, content_length: int, connection: str):
+        """Baut Status-Line und Header im wiederverwendeten Puffer und gibt eine memoryview darauf zurück."""
+        self._header_len = 0
+        self._put(_status_line(http_status_code))
+        for name, value in headers:
+            self._put_header(_encoded_name(name), value)
+        if content_length is not None:
+            self._put_header(b"Content-Length", content_length)
+        self._put_header(b"Connection", connection)
+        self._put(b"\r\n")
+        return memoryview(self._header_buf)[:self._header_len]
+
+    def _connection(self) -> str:
+        return "keep-alive" if self.keep_alive else "close"
+
+    async def send_response(self, http_status_code: int, content="", content_type: str = "text/plain",
+                            connection: str = None, headers: tuple = ()) -> None:
+        """Sendet eine vollständige Antwort mit automatisch berechneter Content-Length.
+
+        @param content str, bytes oder memoryview. bytes werden ohne Kopie gesendet, memoryview unter CPython kopiert (`_owned()`).
+        @param headers Zusätzliche (Name, Wert)-Tupel, z. B. `(("Retry-After", 2),)`.
+        """
+        if connection is None:
+            connection = self._connection()
+        body = content.encode("utf-8") if isinstance(content, str) else content
+        header = self._build_headers(http_status_code, (("Content-Type", content_type),) + tuple(headers),
+                                     len(body), connection)
+        await self.awritev(header, body)
         if connection == "close":
             await self.aclose()
 
-    async def awrite(self, data: bytes) -> None:
-        if self._is_micropython:
-            await self._writer.awrite(data)
-        else:
-            self._writer.write(data)
+    async def send_headers(self, http_status_code: int, headers: list, content_length: int = None,
+                           connection: str = None) -> None:
+        """Sendet Status-Line und Header. Der Body wird danach vom Aufrufer über `awrite()` gesendet.
+
+        @param headers Liste von (Name, Wert)-Tupeln.
+        @param content_length Länge des folgenden Bodys, None für Antworten ohne Body (z. B. 304).
+        @param connection Wert des Connection-Headers, z. B. "Upgrade". Standard: keep-alive/close.
+        """
+        await self.awrite(self._build_headers(http_status_code, headers, content_length,
+                                              connection or self._connection()))
+
+    async def send_event(self, data: str) -> None:
+        """Sendet ein Server-Sent-Event (`data: ...`). Zeilenumbrüche werden HTML-tauglich ersetzt."""
+        await self.send_events((data,))
+
+    async def send_events(self, lines, event_id: int = None) -> None:
+        """Sendet mehrere Ausgaben als ein Server-Sent-Event mit je einer `data:`-Zeile.
+
+        Der Browser erhält sie in `event.data` durch `\n` getrennt. Mit `event_id` kann
+        ein neu verbindender Client per `Last-Event-ID` an dieser Stelle fortsetzen.
+        """
+        event = "".join(["data: " + line.strip().replace("\n", "<br>") + "\n" for line in lines])
+        if event_id is not None:
+            event = f"id: {event_id}\n" + event
+        await self.awrite((event + "\n").encode("utf-8"))
+
+    async def end_events(self) -> None:
+        """Beendet einen Event-Stream mit einem `exit`-Event und schließt die Verbindung.
+
+        Am `exit`-Event erkennt der Browser das reguläre Ende und verbindet sich nicht neu.
+        """
+        try:
+            await self.awrite(b"event: exit\ndata: end\n\n")
+        finally:
+            await self.aclose()
+
+    def _owned(self, data):
+        """Kopiert wiederverwendete Puffer (bytearray, memoryview) unter CPython.
+
+        Der asyncio-Transport behält bei Gegendruck eine Referenz statt einer Kopie,
+        der Aufrufer würde den Inhalt also vor dem Senden überschreiben. MicroPython
+        kopiert in `write()` bzw. sendet in `awrite()` vollständig, dort bleibt es ohne Kopie.
+        """
+        if self._is_micropython or isinstance(data, bytes):
+            return data
+        return bytes(data)
+
+    async def awritev(self, *buffers) -> None:
+        """Sendet mehrere Puffer (z. B. Header und Body) mit einem einzigen drain()."""
+        self.write_pending_since = ticks_ms()
+        try:
+            for buf in buffers:
+                if len(buf):
+                    self._writer.write(self._owned(buf))
             await self._writer.drain()
+        finally:
+            self.write_pending_since = None
+
+    async def awrite(self, data: bytes) -> None:
+        self.write_pending_since = ticks_ms()
+        try:
+            if self._is_micropython:
+                await self._writer.awrite(data)
+            else:
+                self._writer.write(self._owned(data))
+                await self._writer.drain()
+        finally:
+            self.write_pending_since = None
 
     def write(self, data: bytes):
-        self._writer.write(data)
+        self._writer.write(self._owned(data))
+
+    def _mark_closed(self) -> None:
+        if not self.closed:
+            self.closed = True
+            if self.on_close is not None:
+                self.on_close(self)
+
+    def abort(self) -> None:
+        """Bricht die Verbindung sofort ab, ohne ausstehende Daten zu senden.
+
+        Unter MicroPython schließt `Stream.close()` den Socket nicht (erst `wait_closed()`),
+        daher wird der Socket direkt geschlossen.
+        """
+        self._mark_closed()
+        try:
+            if self._is_micropython:
+                self._writer.s.close()
+            else:
+                self._writer.transport.abort()
+        except OSError:
+            pass
 
     async def aclose(self):
-        if self._is_micropython:
-            await self._writer.aclose()
-        else:
-            self._writer.close()
-            await self._writer.wait_closed()
\ No newline at end of file
+        self._mark_closed()
+        try:
+            if self._is_micropython:
+                await self._writer.aclose()
+            else:
+                self._writer.close()
+                await self._writer.wait_closed()
+        except OSError:
+            pass  # Verbindung wurde bereits vom Client oder vom Reaper getrennt
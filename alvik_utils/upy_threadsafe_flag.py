@@ -0,0 +1,42 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class UPYThreadSafeFlag:
+    """Weckt einen Task der Event-Loop aus einem anderen Thread auf.
+
+    Unter MicroPython wird `asyncio.ThreadSafeFlag` verwendet, unter CPython ein
+    `asyncio.Event`, das über `call_soon_threadsafe()` gesetzt wird. Solange der
+    wartende Task noch nicht gelaufen ist, sind weitere `set()`-Aufrufe kostenlos.
+    Muss innerhalb der Event-Loop erzeugt werden.
+    """
+
+    def __init__(self):
+        self._pending = False
+        if hasattr(asyncio, "ThreadSafeFlag"):
+            self._flag = asyncio.ThreadSafeFlag()
+            self._loop = None
+        else:
+            self._flag = asyncio.Event()
+            self._loop = asyncio.get_event_loop()
+
+    def set(self) -> None:
+        """Darf aus jedem Thread aufgerufen werden."""
+        if self._pending:
+            return
+        self._pending = True
+        if self._loop is None:
+            self._flag.set()
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._flag.set)
+            except RuntimeError:
+                pass  # Event-Loop wurde bereits beendet
+
+    async def wait(self) -> None:
+        await self._flag.wait()
+        if self._loop is not None:
+            self._flag.clear()
+        self._pending = False  # ab hier weckt das nächste set() wieder auf
@@ -1,4 +1,69 @@
 import sys
+try:
+    from time import ticks_ms, ticks_diff, ticks_add
+except ImportError:
+    import time
+
+    def ticks_ms() -> int:
+        """Ersatz für `time.ticks_ms()` unter CPython."""
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        """Ersatz für `time.ticks_diff()` unter CPython."""
+        return ticks1 - ticks2
+
+    def ticks_add(ticks: int, delta: int) -> int:
+        """Ersatz für `time.ticks_add()` unter CPython."""
+        return ticks + delta
+
+
+def find_bytes(buf: bytearray, needle: bytes, start: int, end: int) -> int:
+    """Sucht `needle` in `buf[start:end]` und gibt den absoluten Index oder -1 zurück."""
+    try:
+        return buf.find(needle, start, end)
+    except (AttributeError, TypeError):  # MicroPython: bytearray ohne find()
+        idx = bytes(memoryview(buf)[start:end]).find(needle)
+        return idx + start if idx >= 0 else idx
+
+
+def url_decode(s: str, plus_as_space: bool = False) -> str:
+    """Dekodiert `%XX` in URLs (MicroPython hat kein `urllib`).
+
+    `+` steht nur in Query-Strings für ein Leerzeichen (`plus_as_space`), im Pfad ist es ein normales Zeichen.
+    @raise HTTPError(400) wenn die dekodierten Bytes kein UTF-8 sind
+    """
+    if plus_as_space:
+        s = s.replace("+", " ")
+    if "%" not in s:
+        return s
+    parts = s.split("%")
+    data = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        try:
+            if len(part) < 2:
+                raise ValueError(part)
+            data.append(int(part[:2], 16))
+            data.extend(part[2:].encode())
+        except ValueError:
+            data.extend(("%" + part).encode())
+    try:
+        return bytes(data).decode("utf-8")
+    except UnicodeError:
+        from alvik_utils.upy_streamreader import HTTPError  # erst hier, upy_streamreader importiert dieses Modul
+        raise HTTPError(400, "Invalid UTF-8 in URL")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Prüft, ob der `If-None-Match`-Header das ETag enthält (schwache ETags und `*` inklusive)."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag or candidate == "*":
+            return True
+    return False
+
+
 def is_micropython() -> bool:
     return sys.implementation.name == "micropython"
 
@@ -11,4 +76,4 @@ def get_error_message(exception: Exception) -> str:
         import io
         buf = io.StringIO()
         sys.print_exception(exception, buf)
-        return buf.getvalue()
\ No newline at end of file
+        return buf.getvalue()
@@ -1,8 +1,10 @@
 import time
 import network
-from alvik_logger.logger import logger
+from alvik_logger.logger import get_logger
 from alvik_utils.utils import is_micropython
 
+logger = get_logger("wlan")
+
 class AlvikWlan:
     @staticmethod
     def start_hotspot(ssid: str, password: str) -> str:
@@ -13,15 +15,15 @@ class AlvikWlan:
         ap.active(True)
         ap.config(essid=ssid, password=password, authmode=network.AUTH_WPA_WPA2_PSK)
 
-        logger.info(f"Starting Hotspot: SSID={ssid}")
+        logger.info("Starting Hotspot: SSID=%s", ssid)
         timeout = 20
         start_time = time.time()
         while not ap.active() and time.time() < start_time + timeout:
           time.sleep(1)
-          logger.info(f"Waiting for Hotspot to get active")
+          logger.info("Waiting for Hotspot to get active")
 
         ip_address = ap.ifconfig()[0]
-        logger.info(f"Hotspot active, IP address: {ip_address}")
+        logger.info("Hotspot active, IP address: %s", ip_address)
         return ip_address
 
     @staticmethod
@@ -35,7 +37,7 @@ class AlvikWlan:
         for net in networks:
             networks_ssids.append(net[0].decode())
             networks_str_list.append(f"{net[0].decode()} (Signal: {net[3]} dBm)")
-        logger.info(f"Gefundene WLANs: {networks_str_list}")
+        logger.info("Gefundene WLANs: %s", networks_str_list)
         logger.info("Scan abgeschlossen.")
         return networks_ssids
 
@@ -49,7 +51,7 @@ class AlvikWlan:
         if not is_micropython():
             logger.info("Connect to Wifi is only available in Micropython")
             return ""
-        logger.info(f"Connect to WLAN with ssid:'{ssid}' and pw:'{password}'")
+        logger.info("Connect to WLAN with ssid:'%s' and pw:'%s'", ssid, password)
         wlan = network.WLAN(network.STA_IF)
         wlan.active(True)
         wlan.disconnect()  # Trenne vorherige Verbindung, falls vorhanden
@@ -57,7 +59,7 @@ class AlvikWlan:
         networks_ssids = AlvikWlan.scan_wlan_ssids(wlan)
 
         if ssid not in networks_ssids:
-            logger.error(f"Netzwerk SSID '{ssid}' nicht gefunden")
+            logger.error("Netzwerk SSID '%s' nicht gefunden", ssid)
             raise AttributeError(f"Netzwerk SSID '{ssid}' nicht gefunden")
 
         wlan.connect(ssid, password)
@@ -79,9 +81,9 @@ class AlvikWlan:
                 status = f"{status}:Am verbinden"
             else:
                 status = f"{status}:unkown"
-            logger.info(f"Trying to connect to WIFI. Status: {status}")
+            logger.info("Trying to connect to WIFI. Status: %s", status)
             time.sleep(1)  # Kurze Pause, um CPU zu schonen
         logger.info("Connected to Wi-Fi")
         ip_address = wlan.ifconfig()[0]
-        logger.info(f"IP address: {ip_address}")
+        logger.info("IP address: %s", ip_address)
         return ip_address
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""Last- und Latenz-Benchmark für AlvikHTTPServer / AlvikHTTPBootloader unter CPython.
+
+Startet den Bootloader auf localhost (mit Stubs für `network` und `arduino_alvik`),
+treibt typische Anfragen und schreibt die Ergebnisse als JSON, damit Commits
+miteinander verglichen werden können.
+
+    python benchmarks/bench_http_server.py --output bench_results.json
+    python benchmarks/bench_http_server.py --compare bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOUNDARY = "----AlvikBenchBoundary"
+
+
+def _install_stubs() -> None:
+    """Ersetzt die nur auf dem Roboter vorhandenen Module."""
+    sys.modules.setdefault("network", types.ModuleType("network"))
+    arduino_alvik = types.ModuleType("arduino_alvik")
+
+    class ArduinoAlvik:
+        def __init__(self, *args, **kwargs):
+            pass
+    arduino_alvik.ArduinoAlvik = ArduinoAlvik
+    sys.modules.setdefault("arduino_alvik", arduino_alvik)
+
+
+def _percentile(values: list, percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class ServerThread:
+    """Betreibt den Bootloader in einem eigenen Thread mit eigener Event-Loop."""
+
+    def __init__(self, port: int):
+        from alvik_http_bootloader_server import AlvikHTTPBootloader
+        self.port = port
+        self.bootloader = AlvikHTTPBootloader()
+        self.bootloader.controller.max_connections = 64
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = threading.Event()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.bootloader.controller.start("127.0.0.1", self.port))
+        self._started.set()
+        self._loop.run_forever()
+
+    def start(self) -> None:
+        self._thread.start()
+        self._started.wait(5)
+
+    def stop(self) -> None:
+        future = asyncio.run_coroutine_threadsafe(self.bootloader.controller.stop(1), self._loop)
+        future.result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+
+class Client:
+    """Minimaler HTTP/1.1-Client mit Keep-Alive, misst Latenz und übertragene Bytes."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._reader = None
+        self._writer = None
+
+    async def _connect(self) -> None:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection("127.0.0.1", self.port)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: dict = None) -> tuple:
+        await self._connect()
+        lines = [f"{method} {path} HTTP/1.1", "Host: localhost"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+        self._writer.write(data)
+        await self._writer.drain()
+        self.bytes_sent += len(data)
+
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        response_headers = {}
+        for line in head.decode().split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                response_headers[name.strip().lower()] = value.strip()
+        if "content-length" in response_headers:
+            payload = await self._reader.readexactly(int(response_headers["content-length"]))
+        elif status in (101, 204, 304):
+            payload = b""
+        else:
+            payload = await self._reader.read()  # Ende über Verbindungsabbau (z. B. SSE)
+        self.bytes_received += len(head) + len(payload)
+        framed = "content-length" in response_headers or status in (204, 304)
+        if response_headers.get("connection", "").lower() == "close" or not framed:
+            await self.close()
+        return status, payload
+
+
+def _multipart_body(filename: str, content: bytes) -> bytes:
+    return (f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n").encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def _run_scenario(name: str, port: int, requests: int, concurrency: int, make_request) -> dict:
+    """Führt `requests` Anfragen mit `concurrency` parallelen Clients aus."""
+    latencies = []
+    errors = 0
+    clients = [Client(port) for _ in range(concurrency)]
+    counter = iter(range(requests))
+
+    async def worker(client: Client) -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                status, _ = await make_request(client, i)
+                if status >= 400:
+                    errors += 1
+            except (OSError, asyncio.IncompleteReadError):
+                errors += 1
+                await client.close()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in clients))
+    duration = time.perf_counter() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    for client in clients:
+        await client.close()
+    return {
+        "name": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "duration_s": round(duration, 4),
+        "requests_per_s": round(requests / duration, 2) if duration else 0.0,
+        "latency_p50_ms": round(_percentile(latencies, 50), 3),
+        "latency_p99_ms": round(_percentile(latencies, 99), 3),
+        "bytes_sent": sum(client.bytes_sent for client in clients),
+        "bytes_received": sum(client.bytes_received for client in clients),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+async def _run_benchmarks(port: int, scale: int) -> list:
+    def get(path: str, headers: dict = None):
+        return lambda client, _: client.request("GET", path, headers=headers)
+
+    def upload(size: int):
+        content = os.urandom(size)
+
+        def make_request(client: Client, i: int):
+            body = _multipart_body(f"bench_upload_{size}_{i % 4}.bin", content)
+            return client.request("POST", "/upload", body,
+                                  {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+        return make_request
+
+    def run_script(client: Client, _):
+        return client.request("GET", "/run?file=bench_print.py", headers={"Connection": "close"})
+
+    scenarios = [
+        ("get_index", 200 * scale, 1, get("/")),
+        ("get_index_conditional", 200 * scale, 1, get("/", {"If-None-Match": "*"})),
+        ("get_files", 200 * scale, 1, get("/files")),
+        ("get_files_concurrent", 400 * scale, 16, get("/files")),
+        ("upload_1k", 50 * scale, 1, upload(1024)),
+        ("upload_32k", 20 * scale, 1, upload(32 * 1024)),
+        ("upload_256k", 5 * scale, 1, upload(256 * 1024)),
+        ("run_sse", 5 * scale, 1, run_script),
+    ]
+    results = []
+    for name, requests, concurrency, make_request in scenarios:
+        result = await _run_scenario(name, port, requests, concurrency, make_request)
+        print(f"{name:24s} {result['requests_per_s']:9.1f} req/s  p50 {result['latency_p50_ms']:8.2f} ms  "
+              f"p99 {result['latency_p99_ms']:8.2f} ms  errors {result['errors']}")
+        results.append(result)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(previous_file: str, results: list) -> None:
+    with open(previous_file) as fp:
+        previous = {r["name"]: r for r in json.load(fp)["scenarios"]}
+    print(f"\nCompared to {previous_file}:")
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        for key in ("requests_per_s", "latency_p50_ms", "latency_p99_ms", "peak_memory_bytes"):
+            if old[key]:
+                change = (result[key] - old[key]) / old[key] * 100
+                print(f"  {result['name']:24s} {key:18s} {old[key]:>12} -> {result[key]:>12} ({change:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--scale", type=int, default=1, help="Multiplikator für die Anzahl der Anfragen")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Vorheriges Ergebnis, mit dem verglichen wird")
+    args = parser.parse_args()
+
+    _install_stubs()
+    sys.path.insert(0, REPO_ROOT)
+    output = os.path.abspath(args.output)
+    compare = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="alvik_bench_")
+    shutil.copy(os.path.join(REPO_ROOT, "bootloader_index.html"), workdir)
+    with open(os.path.join(workdir, "bench_print.py"), "w") as fp:
+        fp.write("for i in range(200):\n    print('line', i)\n")
+    os.chdir(workdir)  # der Bootloader arbeitet im aktuellen Verzeichnis (wie auf dem Flash)
+
+    from alvik_logger.logger import logger
+    for handler in logger.handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.CRITICAL)  # Konsole ruhig halten, Dateilog bleibt wie auf dem Gerät
+
+    tracemalloc.start()
+    server = ServerThread(args.port)
+    server.start()
+    try:
+        results = asyncio.run(_run_benchmarks(args.port, args.scale))
+    finally:
+        server.stop()
+        tracemalloc.stop()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scenarios": results,
+    }
+    with open(output, "w") as fp:
+        json.dump(report, fp, indent=2)
+    print(f"\nResults written to {output}")
+    if compare:
+        _compare(compare, results)
+
+
+if __name__ == "__main__":
+    main()
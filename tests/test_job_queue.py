@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alvik_utils.upy_code_runner import STOP_NOT_RUNNING, STOP_STOPPED
+from alvik_utils.upy_job_queue import JOB_CANCELLED, JOB_QUEUED, UPYJobQueue
+from alvik_utils.upy_run_stats import RUN_STOPPED, UPYRunStats
+
+
+class _FakeRunner:
+    """Läuft, bis er gestoppt wird."""
+
+    def __init__(self, filename, writer):
+        self.stats = UPYRunStats(filename)
+        self.is_running = False
+        self._done = asyncio.Event()
+
+    async def run_file(self):
+        self.is_running = True
+
+    async def wait_done(self):
+        await self._done.wait()
+
+    async def stop_and_wait(self, timeout=2):
+        if not self.is_running:
+            return STOP_NOT_RUNNING
+        self.is_running = False
+        self.stats.finish(RUN_STOPPED)
+        self._done.set()
+        return STOP_STOPPED
+
+
+class _FakeWriter:
+    def __init__(self):
+        self.ended = False
+
+    async def end_events(self):
+        self.ended = True
+
+
+class UPYJobQueueShutdownTest(unittest.TestCase):
+    def test_shutdown_cancels_more_jobs_than_max_jobs(self):
+        async def scenario():
+            queue = UPYJobQueue(_FakeRunner, max_jobs=2)
+            writers = [_FakeWriter() for _ in range(6)]
+            jobs = [await queue.submit(f"job{i}.py", writer=writer) for i, writer in enumerate(writers)]
+            await asyncio.sleep(0)  # erster Job startet
+            await queue.shutdown()
+            return jobs, writers
+
+        jobs, writers = asyncio.run(scenario())
+        self.assertEqual([job for job in jobs if job.status == JOB_QUEUED], [])
+        self.assertTrue(all(job.status == JOB_CANCELLED for job in jobs[1:]))
+        self.assertTrue(all(writer.ended for writer in writers[1:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
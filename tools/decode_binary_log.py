@@ -0,0 +1,130 @@
+"""Dekodiert die binäre Log-Ringdatei (`BinaryRingLogHandler`) unter CPython zu Text.
+
+Die Datei und die zugehörige Template-Datei (`<datei>.tpl`) vom Roboter kopieren,
+dann:
+
+    python tools/decode_binary_log.py logfile.alog
+    python tools/decode_binary_log.py logfile.alog --level WARNING --utc
+"""
+import argparse
+import calendar
+import json
+import logging
+import os
+import struct
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from alvik_logger.upy_binary_log import (ARG_FALSE, ARG_FLOAT, ARG_INT, ARG_NONE, ARG_STR, ARG_TRUE, HEADER_FORMAT,
+                                         HEADER_SIZE, INLINE_TEXT, MAGIC, VERSION, WRAP_MARKER, decode_varint,
+                                         unzigzag)
+
+
+def load_templates(path: str) -> dict:
+    templates = {}
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            for line in fp:
+                if line.strip():
+                    template_id, template = json.loads(line)
+                    templates[template_id] = template
+    except FileNotFoundError:
+        pass
+    return templates
+
+
+def _decode_text(data: bytes, pos: int) -> tuple:
+    length, pos = decode_varint(data, pos)
+    return data[pos:pos + length].decode("utf-8", "replace"), pos + length
+
+
+def _decode_args(data: bytes, pos: int) -> list:
+    args = []
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        if tag == ARG_INT:
+            value, pos = decode_varint(data, pos)
+            args.append(unzigzag(value))
+        elif tag == ARG_FLOAT:
+            args.append(struct.unpack_from("<f", data, pos)[0])
+            pos += 4
+        elif tag == ARG_STR:
+            value, pos = _decode_text(data, pos)
+            args.append(value)
+        elif tag in (ARG_NONE, ARG_TRUE, ARG_FALSE):
+            args.append({ARG_NONE: None, ARG_TRUE: True, ARG_FALSE: False}[tag])
+        else:
+            raise ValueError(f"Unknown argument tag {tag}")
+    return args
+
+
+def read_records(path: str, templates: dict) -> list:
+    """@return Liste von (Zeit in Sekunden seit 1970, Level, Text), ältester Eintrag zuerst."""
+    with open(path, "rb") as fp:
+        header = fp.read(HEADER_SIZE)
+        ring = fp.read()
+    magic, version, epoch_year, _, size, head, tail, last_ms, count = struct.unpack(HEADER_FORMAT, header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a binary log (version {VERSION})")
+    epoch_offset = calendar.timegm((epoch_year, 1, 1, 0, 0, 0))
+    entries = []
+    pos = tail
+    while len(entries) < count:
+        if size - pos < 2:
+            pos = 0
+            continue
+        length = struct.unpack_from("<H", ring, pos)[0]
+        if length == WRAP_MARKER:
+            pos = 0
+            continue
+        data = ring[pos + 2:pos + length]
+        pos += length
+        level = data[0]
+        delta, offset = decode_varint(data, 1)
+        template_id, offset = decode_varint(data, offset)
+        if template_id == INLINE_TEXT:
+            message = _decode_text(data, offset)[0]
+        else:
+            args = _decode_args(data, offset)
+            template = templates.get(template_id)
+            try:
+                message = template % tuple(args)
+            except (TypeError, ValueError):
+                message = f"<template {template_id}: {template!r}> {args!r}"
+        entries.append((unzigzag(delta), level, message))
+
+    records = []
+    timestamp = last_ms  # Zeitabstände rückwärts vom neuesten Eintrag aufrechnen
+    for delta, level, message in reversed(entries):
+        records.append((timestamp / 1000 + epoch_offset, level, message))
+        timestamp -= delta
+    records.reverse()
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("logfile")
+    parser.add_argument("--templates", help="Template-Datei, Standard: <logfile>.tpl")
+    parser.add_argument("--level", default="DEBUG", help="nur Einträge ab diesem Level ausgeben")
+    parser.add_argument("--utc", action="store_true", help="Zeiten in UTC statt lokaler Zeit")
+    args = parser.parse_args()
+
+    min_level = logging.getLevelName(args.level.upper())
+    if not isinstance(min_level, int):
+        parser.error(f"Unknown level {args.level}")
+    templates = load_templates(args.templates or args.logfile + ".tpl")
+    convert = time.gmtime if args.utc else time.localtime
+    for timestamp, level, message in read_records(args.logfile, templates):
+        if level < min_level:
+            continue
+        asctime = time.strftime("%Y-%m-%d %H:%M:%S", convert(timestamp)) + f",{int(timestamp * 1000) % 1000:03d}"
+        print(f"{asctime} - {logging.getLevelName(level)} - {message}")
+
+
+if __name__ == "__main__":
+    main()